@@ -0,0 +1,218 @@
+from itertools import product
+from multiprocessing import get_context
+import argparse
+import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from generate import generate_vcf
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# (variant_type, alternate_bases) pairs covering every matcher branch
+VARIANT_QUERIES = [
+    (None, "N"),
+    (None, "A"),
+    ("DEL", "N"),
+    ("INS", "N"),
+    ("DUP", "N"),
+    ("DUP:TANDEM", "N"),
+    ("CNV", "N"),
+    ("INV", "N"),
+]
+GRANULARITY_QUERIES = [
+    ("boolean", False),
+    ("count", False),
+    ("record", False),
+    ("record", True),
+]
+# performQuery talks to S3 and DynamoDB only through these, the offline
+# runs use local files so the side channels are switched off
+OFFLINE_ENVIRONMENT = {
+    "VARIANTS_BUCKET": "offline",
+    "CONFIG_VARIANT_QUERY_CACHE_SIZE": "0",
+    "DYNAMO_DATASETS_TABLE": "offline",
+    "DYNAMO_VCF_SUMMARIES_TABLE": "offline",
+    "DYNAMO_VARIANT_DUPLICATES_TABLE": "offline",
+    "DYNAMO_VARIANT_QUERIES_TABLE": "offline",
+    "DYNAMO_VARIANT_QUERY_RESPONSES_TABLE": "offline",
+    "DYNAMO_ONTOLOGIES_TABLE": "offline",
+    "DYNAMO_ANSCESTORS_TABLE": "offline",
+    "DYNAMO_DESCENDANTS_TABLE": "offline",
+    "DYNAMO_CONCURRENCY_BUDGETS_TABLE": "offline",
+    "AWS_DEFAULT_REGION": "us-east-1",
+}
+
+
+def import_engine(reader):
+    os.environ.update(OFFLINE_ENVIRONMENT)
+    os.environ["CONFIG_VARIANT_QUERY_READER"] = reader
+    sys.path.insert(
+        0, os.path.join(ROOT, "shared_resources", "python-modules", "python")
+    )
+    from shared.variantquery import query_engine
+
+    query_engine.query_sidecar = lambda *args, **kwargs: None
+    query_engine.QueryCancellation = lambda query_id: None
+
+    return query_engine
+
+
+def timed(function, repeat):
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_case(case, repeat, queue):
+    query_engine = import_engine(case["reader"])
+    from shared.variantquery import get_reader
+    from shared.variantquery.query_builder import QueryBuiler
+    from shared.payloads import VariantColumns
+
+    region = f"1:1-{case['width']}"
+    payload = {
+        "query_id": "benchmark",
+        "dataset_id": "benchmark",
+        "vcf_location": case["vcf"],
+        "region": region,
+        "samples": [],
+        "reference_bases": "N",
+        "alternate_bases": case["alternate_bases"],
+        "end_min": 0,
+        "end_max": case["width"] * 2,
+        "variant_min_length": 0,
+        "variant_max_length": -1,
+        "include_details": True,
+        "include_samples": case["include_samples"],
+        "variant_type": case["variant_type"],
+        "requested_granularity": case["granularity"],
+    }
+
+    # subprocess I/O only, bcftools output is drained without parsing
+    def bcftools_io():
+        args = QueryBuiler().set_regions([region]).set_vcf(case["vcf"]).build()
+        with open(os.devnull, "w") as devnull:
+            subprocess.run(args, stdout=devnull, check=True, cwd="/tmp")
+
+    # reading and parsing records, no matching
+    def reader_pass():
+        reader = get_reader(case["reader"])
+        return sum(1 for _ in reader.fetch(case["vcf"], [region]))
+
+    io_seconds, _ = timed(bcftools_io, repeat)
+    reader_seconds, records = timed(reader_pass, repeat)
+    total_seconds, response = timed(lambda: query_engine.perform_query(payload), repeat)
+
+    queue.put(
+        {
+            **case,
+            "records": records,
+            "call_count": response["call_count"],
+            "variants": len(VariantColumns.load(response["variants"])),
+            "bcftools_io_seconds": io_seconds,
+            "reader_seconds": reader_seconds,
+            "total_seconds": total_seconds,
+            "parsing_seconds": max(reader_seconds - io_seconds, 0)
+            if case["reader"] == "bcftools"
+            else reader_seconds,
+            "matching_seconds": max(total_seconds - reader_seconds, 0),
+            "records_per_second": records / total_seconds if total_seconds else None,
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "peak_child_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        }
+    )
+
+
+def run_isolated(case, repeat):
+    # a fresh process per case so peak RSS is not carried over
+    context = get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=run_case, args=(case, repeat, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+
+    return result
+
+
+def get_version():
+    try:
+        return subprocess.check_output(
+            ["git", "describe", "--always", "--dirty"], cwd=ROOT, encoding="ascii"
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def parse_list(cast):
+    return lambda value: [cast(item) for item in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline performQuery benchmarks")
+    parser.add_argument("--samples", type=parse_list(int), default=[10, 1000, 5000])
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--widths", type=parse_list(int), default=[1000, 20000, 160000])
+    parser.add_argument("--readers", type=parse_list(str), default=["htslib", "bcftools"])
+    parser.add_argument("--sv-fraction", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--quick", action="store_true", help="only SNV queries")
+    parser.add_argument("--data", default="/tmp/sbeacon-benchmarks")
+    parser.add_argument("--output", default="benchmark-results.jsonl")
+    args = parser.parse_args()
+
+    variant_queries = VARIANT_QUERIES[:2] if args.quick else VARIANT_QUERIES
+    version = get_version()
+    started = datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+    with open(args.output, "a") as output:
+        for n_samples, with_ac_an in product(args.samples, [True, False]):
+            vcf = generate_vcf(
+                args.data,
+                n_samples,
+                args.records,
+                with_ac_an=with_ac_an,
+                sv_fraction=args.sv_fraction,
+            )
+
+            for reader, width, (variant_type, alternate_bases), (
+                granularity,
+                include_samples,
+            ) in product(args.readers, args.widths, variant_queries, GRANULARITY_QUERIES):
+                case = {
+                    "version": version,
+                    "started": started,
+                    "vcf": vcf,
+                    "samples": n_samples,
+                    "with_ac_an": with_ac_an,
+                    "sv_fraction": args.sv_fraction,
+                    "reader": reader,
+                    "width": width,
+                    "variant_type": variant_type,
+                    "alternate_bases": alternate_bases,
+                    "granularity": granularity,
+                    "include_samples": include_samples,
+                }
+                result = run_isolated(case, args.repeat)
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+                print(
+                    f"{reader:8} samples={n_samples:<5} acan={with_ac_an!s:5} "
+                    f"width={width:<6} type={variant_type!s:10} alt={alternate_bases} "
+                    f"{granularity:7} samples={include_samples!s:5} "
+                    f"{result['records_per_second'] or 0:10.0f} rec/s "
+                    f"rss={result['peak_rss_kb']}kB"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import os
+import sys
+import uuid
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Checks that an identical variant search is answered from the "
+        "result cache of a deployed beacon"
+    )
+    parser.add_argument("--queries-table", default="VariantQueries")
+    parser.add_argument("--responses-table", default="VariantQueryResponses")
+    parser.add_argument("--datasets-table", default="Datasets")
+    parser.add_argument("--bucket", required=True, help="the variants bucket")
+    parser.add_argument("--region", default=os.environ.get("AWS_DEFAULT_REGION"))
+    args = parser.parse_args()
+
+    # other tables are not touched, their names only need to be set
+    os.environ.update(
+        {
+            "AWS_DEFAULT_REGION": args.region,
+            "VARIANTS_BUCKET": args.bucket,
+            "SPLIT_QUERY_LAMBDA": "unused",
+            "DYNAMO_DATASETS_TABLE": args.datasets_table,
+            "DYNAMO_VARIANT_QUERIES_TABLE": args.queries_table,
+            "DYNAMO_VARIANT_QUERY_RESPONSES_TABLE": args.responses_table,
+            "DYNAMO_VCF_SUMMARIES_TABLE": "unused",
+            "DYNAMO_VARIANT_DUPLICATES_TABLE": "unused",
+            "DYNAMO_ONTOLOGIES_TABLE": "unused",
+            "DYNAMO_ANSCESTORS_TABLE": "unused",
+            "DYNAMO_DESCENDANTS_TABLE": "unused",
+            "DYNAMO_CONCURRENCY_BUDGETS_TABLE": "unused",
+        }
+    )
+    sys.path.insert(
+        0, os.path.join(ROOT, "shared_resources", "python-modules", "python")
+    )
+    from shared.variantutils.result_cache import cache_key, get_cached, put_cached
+
+    class CheckDataset:
+        # a dataset id that does not exist has an empty version
+        id = f"cache-check-{uuid.uuid4().hex}"
+        _vcfLocations = ["s3://check/check.vcf.gz"]
+
+    search = {"reference_name": "1", "start": [100, 100], "end": [200, 200]}
+    results = [{"dataset_id": CheckDataset.id, "exists": True, "call_count": 1}]
+
+    first_key = cache_key([CheckDataset], [], dict(search))
+    assert get_cached(first_key) is None, "a new search was found in the cache"
+    put_cached(first_key, results)
+
+    # the second identical search must build the same key and find the results
+    second_key = cache_key([CheckDataset], [], dict(search))
+    assert second_key == first_key, "identical searches have different keys"
+    assert get_cached(second_key) == results, "the search was not cached"
+    print(f"Identical search answered from the cache under {second_key}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import os
+import subprocess
+
+import numpy as np
+
+
+BASES = np.array(list("ACGT"))
+SYMBOLIC_ALTS = [
+    "<DEL>",
+    "<INS>",
+    "<DUP>",
+    "<DUP:TANDEM>",
+    "<CN0>",
+    "<CN2>",
+    "<CNV>",
+    "<INV>",
+]
+HEADER = """##fileformat=VCFv4.2
+##contig=<ID={contig},length={length}>
+##INFO=<ID=AC,Number=A,Type=Integer,Description="Allele count in genotypes">
+##INFO=<ID=AN,Number=1,Type=Integer,Description="Total number of alleles in called genotypes">
+##INFO=<ID=VT,Number=.,Type=String,Description="Variant type">
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">
+#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\t{samples}
+"""
+
+
+def random_alleles(rng, sv_fraction):
+    ref = "".join(rng.choice(BASES, rng.integers(1, 4)))
+    kind = rng.random()
+
+    if kind < sv_fraction:
+        return ref[0], [str(rng.choice(SYMBOLIC_ALTS))], "SV"
+    if kind < sv_fraction + 0.15:
+        # explicit deletion, duplication or insertion
+        alts = [alt for alt in (ref[0], ref + ref, ref * 3) if alt != ref]
+        return ref, alts[: rng.integers(1, len(alts) + 1)], "INDEL"
+
+    alts = [base for base in BASES if base != ref[0]]
+    return ref[0], list(rng.choice(alts, rng.integers(1, 3), replace=False)), "SNP"
+
+
+def generate_vcf(
+    directory,
+    n_samples,
+    n_records,
+    with_ac_an=True,
+    sv_fraction=0.05,
+    spacing=10,
+    missing_fraction=0.01,
+    contig="1",
+    seed=0,
+):
+    """
+    Writes a bgzipped and tabix indexed vcf with random diploid phased
+    genotypes and returns its path. Files are reused when they exist.
+    """
+    name = (
+        f"synthetic-{n_samples}s-{n_records}r-"
+        f"{'acan' if with_ac_an else 'noacan'}-{int(sv_fraction * 100)}sv.vcf"
+    )
+    path = os.path.join(directory, name)
+
+    if os.path.exists(path + ".gz.tbi"):
+        return path + ".gz"
+
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    samples = [f"SAMPLE{n:06d}" for n in range(n_samples)]
+
+    with open(path, "w") as vcf:
+        vcf.write(
+            HEADER.format(
+                contig=contig,
+                length=n_records * spacing + 1000,
+                samples="\t".join(samples),
+            )
+        )
+        for n in range(n_records):
+            ref, alts, variant_type = random_alleles(rng, sv_fraction)
+            frequencies = rng.dirichlet(np.ones(len(alts) + 1) * 0.3)
+            genotypes = rng.choice(len(alts) + 1, (n_samples, 2), p=frequencies)
+            calls = np.char.add(
+                np.char.add(genotypes[:, 0].astype(str), "|"),
+                genotypes[:, 1].astype(str),
+            )
+            calls[rng.random(n_samples) < missing_fraction] = ".|."
+            info = f"VT={variant_type}"
+
+            if with_ac_an:
+                called = genotypes[calls != ".|."]
+                ac = ",".join(
+                    str(np.count_nonzero(called == i + 1)) for i in range(len(alts))
+                )
+                info = f"AC={ac};AN={called.size};{info}"
+
+            vcf.write(
+                f"{contig}\t{(n + 1) * spacing}\t.\t{ref}\t{','.join(alts)}\t.\tPASS"
+                f"\t{info}\tGT\t" + "\t".join(calls.tolist()) + "\n"
+            )
+
+    subprocess.run(["bgzip", "--force", path], check=True)
+    subprocess.run(["tabix", "--preset", "vcf", "--force", path + ".gz"], check=True)
+
+    return path + ".gz"
+
+
+if __name__ == "__main__":
+    pass
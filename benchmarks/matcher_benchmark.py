@@ -0,0 +1,180 @@
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from generate import random_alleles
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# (variant_type, alternate_bases) pairs covering every matcher branch
+VARIANT_QUERIES = [
+    (None, "N"),
+    (None, "A"),
+    ("DEL", "N"),
+    ("INS", "N"),
+    ("DUP", "N"),
+    ("DUP:TANDEM", "N"),
+    ("CNV", "N"),
+    ("INV", "N"),
+]
+
+
+def branching_match(
+    reference, alts, variant_type, alternate_bases, min_length, max_length
+):
+    """
+    Allele matching as it was inlined in the record loop of performQuery,
+    branching on the query and compiling patterns for every record.
+    """
+    prefix = f"<{variant_type}"
+    reference_length = len(reference)
+
+    if alternate_bases == "N" and variant_type is not None:
+        if variant_type == "DEL":
+            return [
+                i
+                for i, alt in enumerate(alts)
+                if (
+                    (alt.startswith(prefix) or alt == "<CN0>")
+                    if alt.startswith("<")
+                    else len(alt) < reference_length
+                )
+                and min_length <= len(alt) <= max_length
+            ]
+        elif variant_type == "INS":
+            return [
+                i
+                for i, alt in enumerate(alts)
+                if (
+                    alt.startswith(prefix)
+                    if alt.startswith("<")
+                    else len(alt) > reference_length
+                )
+                and min_length <= len(alt) <= max_length
+            ]
+        elif variant_type == "DUP":
+            pattern = re.compile("({}){{2,}}".format(reference))
+            return [
+                i
+                for i, alt in enumerate(alts)
+                if (
+                    (
+                        alt.startswith(prefix)
+                        or (alt.startswith("<CN") and alt not in ("<CN0>", "<CN1>"))
+                    )
+                    if alt.startswith("<")
+                    else pattern.fullmatch(alt)
+                )
+                and min_length <= len(alt) <= max_length
+            ]
+        elif variant_type == "DUP:TANDEM":
+            tandem = reference + reference
+            return [
+                i
+                for i, alt in enumerate(alts)
+                if (
+                    (alt.startswith(prefix) or alt == "<CN2>")
+                    if alt.startswith("<")
+                    else alt == tandem
+                )
+                and min_length <= len(alt) <= max_length
+            ]
+        elif variant_type == "CNV":
+            pattern = re.compile("\\.|({})*".format(reference))
+            return [
+                i
+                for i, alt in enumerate(alts)
+                if (
+                    (
+                        alt.startswith(prefix)
+                        or alt.startswith("<CN")
+                        or alt.startswith("<DEL")
+                        or alt.startswith("<DUP")
+                    )
+                    if alt.startswith("<")
+                    else pattern.fullmatch(alt)
+                )
+                and min_length <= len(alt) <= max_length
+            ]
+        else:
+            return [
+                i
+                for i, alt in enumerate(alts)
+                if alt.startswith(prefix) and min_length <= len(alt) <= max_length
+            ]
+    elif alternate_bases == "N":
+        return [i for i, alt in enumerate(alts) if min_length <= len(alt) <= max_length]
+    else:
+        return [
+            i
+            for i, alt in enumerate(alts)
+            if alt.upper() == alternate_bases and min_length <= len(alt) <= max_length
+        ]
+
+
+def timed(function, repeat):
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Allele matching throughput of the compiled variant matcher"
+    )
+    parser.add_argument("--records", type=int, default=200000)
+    parser.add_argument("--sv-fraction", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sys.path.insert(
+        0, os.path.join(ROOT, "shared_resources", "python-modules", "python")
+    )
+    from shared.variantquery.variant_matcher import build_matcher
+
+    rng = np.random.default_rng(args.seed)
+    records = [random_alleles(rng, args.sv_fraction)[:2] for _ in range(args.records)]
+    min_length, max_length = 0, float("inf")
+
+    for variant_type, alternate_bases in VARIANT_QUERIES:
+        matcher = build_matcher(variant_type, alternate_bases, min_length, max_length)
+
+        branching_seconds, branching_hits = timed(
+            lambda: [
+                branching_match(
+                    reference,
+                    alts,
+                    variant_type,
+                    alternate_bases,
+                    min_length,
+                    max_length,
+                )
+                for reference, alts in records
+            ],
+            args.repeat,
+        )
+        compiled_seconds, compiled_hits = timed(
+            lambda: [matcher(reference, alts) for reference, alts in records],
+            args.repeat,
+        )
+
+        assert branching_hits == compiled_hits, f"hits differ for {variant_type}"
+        print(
+            f"type={variant_type!s:10} alt={alternate_bases} "
+            f"branching={len(records) / branching_seconds:10.0f} rec/s "
+            f"compiled={len(records) / compiled_seconds:10.0f} rec/s "
+            f"speedup={branching_seconds / compiled_seconds:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -93,6 +93,20 @@ resource "aws_dynamodb_table" "variant_duplicates" {
   }
 }
 
+# slots leased by concurrent variant searches, they
+# limit the performQuery invocations of large searches
+resource "aws_dynamodb_table" "concurrency_budgets" {
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "id"
+  name         = "ConcurrencyBudgets"
+  tags         = var.common-tags
+
+  attribute {
+    name = "id"
+    type = "S"
+  }
+}
+
 # this table holds the query made by user
 # this is used to control the lambdas that
 # execute a given query
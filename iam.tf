@@ -35,6 +35,7 @@ data "aws_iam_policy_document" "lambda-submitDataset" {
     ]
     resources = [
       aws_sns_topic.summariseDataset.arn,
+      aws_sns_topic.indexGenotypes.arn,
     ]
   }
 
@@ -102,6 +103,30 @@ data "aws_iam_policy_document" "lambda-summariseDataset" {
   }
 }
 
+#
+# indexGenotypes Lambda Function
+#
+data "aws_iam_policy_document" "lambda-indexGenotypes" {
+  statement {
+    actions = [
+      "s3:GetObject",
+      "s3:ListBucket",
+    ]
+    resources = ["*"]
+  }
+
+  statement {
+    actions = [
+      "s3:PutObject",
+      "s3:CreateMultipartUpload",
+      "s3:UploadPart",
+      "s3:CompleteMultipartUpload",
+      "s3:AbortMultipartUpload",
+    ]
+    resources = ["${aws_s3_bucket.variants-bucket.arn}/*"]
+  }
+}
+
 #
 # summariseVcf Lambda Function
 #
@@ -341,11 +366,46 @@ data "aws_iam_policy_document" "lambda-getAnalyses" {
     resources = ["*"]
   }
 
+  # admission of large variant searches
+  statement {
+    actions = [
+      "dynamodb:GetItem",
+      "dynamodb:PutItem",
+      "dynamodb:UpdateItem",
+    ]
+    resources = [
+      aws_dynamodb_table.concurrency_budgets.arn,
+    ]
+  }
+
+  # cached variant search results
+  statement {
+    actions = [
+      "dynamodb:PutItem",
+    ]
+    resources = [
+      aws_dynamodb_table.variant_query_responses.arn,
+    ]
+  }
+
+  statement {
+    actions = [
+      "s3:PutObject",
+    ]
+    resources = [
+      "${aws_s3_bucket.variants-bucket.arn}/variant-queries/*",
+      "${aws_s3_bucket.variants-bucket.arn}/sample-lists/*",
+    ]
+  }
+
   statement {
     actions = [
       "lambda:InvokeFunction",
     ]
-    resources = [module.lambda-splitQuery.lambda_function_arn]
+    resources = [
+      module.lambda-splitQuery.lambda_function_arn,
+      module.lambda-performQuery.lambda_function_arn,
+    ]
   }
 
   statement {
@@ -397,11 +457,36 @@ data "aws_iam_policy_document" "lambda-getGenomicVariants" {
     ]
   }
 
+  # admission of large variant searches
+  statement {
+    actions = [
+      "dynamodb:GetItem",
+      "dynamodb:PutItem",
+      "dynamodb:UpdateItem",
+    ]
+    resources = [
+      aws_dynamodb_table.concurrency_budgets.arn,
+    ]
+  }
+
+  statement {
+    actions = [
+      "s3:PutObject",
+    ]
+    resources = [
+      "${aws_s3_bucket.variants-bucket.arn}/variant-queries/*",
+      "${aws_s3_bucket.variants-bucket.arn}/sample-lists/*",
+    ]
+  }
+
   statement {
     actions = [
       "lambda:InvokeFunction",
     ]
-    resources = [module.lambda-splitQuery.lambda_function_arn]
+    resources = [
+      module.lambda-splitQuery.lambda_function_arn,
+      module.lambda-performQuery.lambda_function_arn,
+    ]
   }
 
   statement {
@@ -467,11 +552,46 @@ data "aws_iam_policy_document" "lambda-getIndividuals" {
     resources = ["*"]
   }
 
+  # admission of large variant searches
+  statement {
+    actions = [
+      "dynamodb:GetItem",
+      "dynamodb:PutItem",
+      "dynamodb:UpdateItem",
+    ]
+    resources = [
+      aws_dynamodb_table.concurrency_budgets.arn,
+    ]
+  }
+
+  # cached variant search results
+  statement {
+    actions = [
+      "dynamodb:PutItem",
+    ]
+    resources = [
+      aws_dynamodb_table.variant_query_responses.arn,
+    ]
+  }
+
+  statement {
+    actions = [
+      "s3:PutObject",
+    ]
+    resources = [
+      "${aws_s3_bucket.variants-bucket.arn}/variant-queries/*",
+      "${aws_s3_bucket.variants-bucket.arn}/sample-lists/*",
+    ]
+  }
+
   statement {
     actions = [
       "lambda:InvokeFunction",
     ]
-    resources = [module.lambda-splitQuery.lambda_function_arn]
+    resources = [
+      module.lambda-splitQuery.lambda_function_arn,
+      module.lambda-performQuery.lambda_function_arn,
+    ]
   }
 
   statement {
@@ -529,11 +649,46 @@ data "aws_iam_policy_document" "lambda-getBiosamples" {
     resources = ["*"]
   }
 
+  # admission of large variant searches
+  statement {
+    actions = [
+      "dynamodb:GetItem",
+      "dynamodb:PutItem",
+      "dynamodb:UpdateItem",
+    ]
+    resources = [
+      aws_dynamodb_table.concurrency_budgets.arn,
+    ]
+  }
+
+  # cached variant search results
+  statement {
+    actions = [
+      "dynamodb:PutItem",
+    ]
+    resources = [
+      aws_dynamodb_table.variant_query_responses.arn,
+    ]
+  }
+
+  statement {
+    actions = [
+      "s3:PutObject",
+    ]
+    resources = [
+      "${aws_s3_bucket.variants-bucket.arn}/variant-queries/*",
+      "${aws_s3_bucket.variants-bucket.arn}/sample-lists/*",
+    ]
+  }
+
   statement {
     actions = [
       "lambda:InvokeFunction",
     ]
-    resources = [module.lambda-splitQuery.lambda_function_arn]
+    resources = [
+      module.lambda-splitQuery.lambda_function_arn,
+      module.lambda-performQuery.lambda_function_arn,
+    ]
   }
 
   statement {
@@ -591,11 +746,46 @@ data "aws_iam_policy_document" "lambda-getDatasets" {
     resources = ["*"]
   }
 
+  # admission of large variant searches
+  statement {
+    actions = [
+      "dynamodb:GetItem",
+      "dynamodb:PutItem",
+      "dynamodb:UpdateItem",
+    ]
+    resources = [
+      aws_dynamodb_table.concurrency_budgets.arn,
+    ]
+  }
+
+  # cached variant search results
+  statement {
+    actions = [
+      "dynamodb:PutItem",
+    ]
+    resources = [
+      aws_dynamodb_table.variant_query_responses.arn,
+    ]
+  }
+
+  statement {
+    actions = [
+      "s3:PutObject",
+    ]
+    resources = [
+      "${aws_s3_bucket.variants-bucket.arn}/variant-queries/*",
+      "${aws_s3_bucket.variants-bucket.arn}/sample-lists/*",
+    ]
+  }
+
   statement {
     actions = [
       "lambda:InvokeFunction",
     ]
-    resources = [module.lambda-splitQuery.lambda_function_arn]
+    resources = [
+      module.lambda-splitQuery.lambda_function_arn,
+      module.lambda-performQuery.lambda_function_arn,
+    ]
   }
 
   statement {
@@ -699,11 +889,46 @@ data "aws_iam_policy_document" "lambda-getRuns" {
     resources = ["*"]
   }
 
+  # admission of large variant searches
+  statement {
+    actions = [
+      "dynamodb:GetItem",
+      "dynamodb:PutItem",
+      "dynamodb:UpdateItem",
+    ]
+    resources = [
+      aws_dynamodb_table.concurrency_budgets.arn,
+    ]
+  }
+
+  # cached variant search results
+  statement {
+    actions = [
+      "dynamodb:PutItem",
+    ]
+    resources = [
+      aws_dynamodb_table.variant_query_responses.arn,
+    ]
+  }
+
+  statement {
+    actions = [
+      "s3:PutObject",
+    ]
+    resources = [
+      "${aws_s3_bucket.variants-bucket.arn}/variant-queries/*",
+      "${aws_s3_bucket.variants-bucket.arn}/sample-lists/*",
+    ]
+  }
+
   statement {
     actions = [
       "lambda:InvokeFunction",
     ]
-    resources = [module.lambda-splitQuery.lambda_function_arn]
+    resources = [
+      module.lambda-splitQuery.lambda_function_arn,
+      module.lambda-performQuery.lambda_function_arn,
+    ]
   }
 
   statement {
@@ -749,6 +974,34 @@ data "aws_iam_policy_document" "lambda-splitQuery" {
       aws_sns_topic.performQuery.arn,
     ]
   }
+
+  statement {
+    actions = [
+      "dynamodb:GetItem",
+      "dynamodb:UpdateItem",
+    ]
+    resources = [
+      aws_dynamodb_table.variant_queries.arn,
+    ]
+  }
+
+  statement {
+    actions = [
+      "dynamodb:PutItem",
+    ]
+    resources = [
+      aws_dynamodb_table.variant_query_responses.arn,
+    ]
+  }
+
+  statement {
+    actions = [
+      "s3:PutObject",
+    ]
+    resources = [
+      "${aws_s3_bucket.variants-bucket.arn}/variant-queries/*",
+    ]
+  }
 }
 
 #
@@ -791,7 +1044,8 @@ data "aws_iam_policy_document" "athena-full-access" {
     actions = [
       "athena:GetQueryExecution",
       "athena:GetQueryResults",
-      "athena:StartQueryExecution"
+      "athena:StartQueryExecution",
+      "athena:StopQueryExecution",
     ]
     resources = [
       aws_athena_workgroup.sbeacon-workgroup.arn,
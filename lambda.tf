@@ -20,6 +20,17 @@ resource "aws_lambda_permission" "SNSSummariseVcf" {
   source_arn    = aws_sns_topic.summariseVcf.arn
 }
 
+#
+# indexGenotypes Lambda Function
+#
+resource "aws_lambda_permission" "SNSIndexGenotypes" {
+  statement_id  = "AllowSNSIndexGenotypesInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = module.lambda-indexGenotypes.lambda_function_arn
+  principal     = "sns.amazonaws.com"
+  source_arn    = aws_sns_topic.indexGenotypes.arn
+}
+
 #
 # summariseSlice Lambda Function
 #
@@ -1,5 +1,4 @@
 import json
-from concurrent.futures import ThreadPoolExecutor
 
 import jsons
 
@@ -73,24 +72,17 @@ def route(request: RequestParams):
         return responses.bundle_response(200, response)
 
     if request.query.requested_granularity == Granularity.RECORD:
-        executor = ThreadPoolExecutor(2)
-        # records fetching
+        # records and the total count from a single query
         record_query = get_record_query(
             request.query.pagination.skip, request.query.pagination.limit, conditions
         )
-        record_future = executor.submit(
-            Cohort.get_by_query, record_query, execution_parameters=execution_parameters
-        )
-        # counts fetching
         count_query = get_count_query(conditions)
-        count_future = executor.submit(
-            Cohort.get_count_by_query,
+        cohorts, count = Cohort.get_by_query_with_count(
+            record_query,
             count_query,
+            skip=request.query.pagination.skip,
             execution_parameters=execution_parameters,
         )
-        executor.shutdown()
-        count = count_future.result()
-        cohorts = record_future.result()
         response = responses.build_beacon_collection_response(
             jsons.dump(cohorts, strip_privates=True),
             count,
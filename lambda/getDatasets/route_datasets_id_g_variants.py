@@ -60,7 +60,10 @@ def route(request: RequestParams, dataset_id):
     if conditions:
         query = datasets_query(conditions, query_params.assembly_id, dataset_id)
         exec_id = run_custom_query(
-            query, return_id=True, execution_parameters=execution_parameters
+            query,
+            return_id=True,
+            execution_parameters=execution_parameters,
+            columnar=True,
         )
         datasets, samples = parse_datasets_with_samples(exec_id)
     else:
@@ -83,6 +86,7 @@ def route(request: RequestParams, dataset_id):
         requested_granularity=request.query.requested_granularity,
         include_datasets=request.query.include_resultset_responses,
         dataset_samples=samples,
+        user_group=request._user_group,
     )
 
     variants = set()
@@ -102,8 +106,7 @@ def route(request: RequestParams, dataset_id):
             if check_all:
                 variants.update(query_response.variants)
 
-                for variant in query_response.variants:
-                    chrom, pos, ref, alt, typ = variant.split("\t")
+                for chrom, pos, ref, alt, typ in query_response.variants:
                     idx = f"{pos}_{ref}_{alt}"
                     variant_call_counts[idx] += query_response.call_count
                     variant_allele_counts[idx] += query_response.all_alleles_count
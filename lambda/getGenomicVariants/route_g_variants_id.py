@@ -64,7 +64,10 @@ def route(request: RequestParams, variant_id):
     if conditions:
         query = datasets_query(conditions, assembly_id)
         exec_id = run_custom_query(
-            query, return_id=True, execution_parameters=execution_parameters
+            query,
+            return_id=True,
+            execution_parameters=execution_parameters,
+            columnar=True,
         )
         datasets, samples = parse_datasets_with_samples(exec_id)
     else:
@@ -95,6 +98,7 @@ def route(request: RequestParams, variant_id):
         requested_granularity=request.query.requested_granularity,
         include_datasets="ALL",
         dataset_samples=samples,
+        user_group=request._user_group,
     )
 
     exists = False
@@ -107,8 +111,7 @@ def route(request: RequestParams, variant_id):
                 break
             variants.update(query_response.variants)
 
-            for variant in query_response.variants:
-                chrom, pos, ref, alt, typ = variant.split("\t")
+            for chrom, pos, ref, alt, typ in query_response.variants:
                 idx = f"{pos}_{ref}_{alt}"
                 variant_call_counts[idx] += query_response.call_count
                 variant_allele_counts[idx] += query_response.all_alleles_count
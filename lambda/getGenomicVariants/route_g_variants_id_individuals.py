@@ -100,7 +100,10 @@ def route(request: RequestParams, variant_id):
     if conditions:
         query = datasets_query(conditions, assembly_id)
         exec_id = run_custom_query(
-            query, return_id=True, execution_parameters=execution_parameters
+            query,
+            return_id=True,
+            execution_parameters=execution_parameters,
+            columnar=True,
         )
         datasets, samples = parse_datasets_with_samples(exec_id)
     else:
@@ -120,6 +123,7 @@ def route(request: RequestParams, variant_id):
         requested_granularity="record",  # we need the records for this task
         dataset_samples=samples,
         include_samples=True,
+        user_group=request._user_group,
     )
 
     exists = False
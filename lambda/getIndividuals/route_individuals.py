@@ -1,5 +1,4 @@
 import json
-from concurrent.futures import ThreadPoolExecutor
 
 import jsons
 
@@ -75,26 +74,17 @@ def route(request: RequestParams):
         return bundle_response(200, response)
 
     if request.query.requested_granularity == Granularity.RECORD:
-        executor = ThreadPoolExecutor(2)
-        # records fetching
+        # records and the total count from a single query
         record_query = get_record_query(
             request.query.pagination.skip, request.query.pagination.limit, conditions
         )
-        record_future = executor.submit(
-            Individual.get_by_query,
-            record_query,
-            execution_parameters=execution_parameters,
-        )
-        # counts fetching
         count_query = get_count_query(conditions)
-        count_future = executor.submit(
-            Individual.get_count_by_query,
+        individuals, count = Individual.get_by_query_with_count(
+            record_query,
             count_query,
+            skip=request.query.pagination.skip,
             execution_parameters=execution_parameters,
         )
-        executor.shutdown()
-        count = count_future.result()
-        individuals = record_future.result()
         response = build_beacon_resultset_response(
             jsons.dump(individuals, strip_privates=True),
             count,
@@ -47,7 +47,10 @@ def route(request: RequestParams, individual_id):
     query_params = request.query.request_parameters
     query = datasets_query(conditions, query_params.assembly_id, individual_id)
     exec_id = run_custom_query(
-        query, return_id=True, execution_parameters=execution_parameters
+        query,
+        return_id=True,
+        execution_parameters=execution_parameters,
+        columnar=True,
     )
     datasets, samples = parse_datasets_with_samples(exec_id)
     check_all = request.query.include_resultset_responses in (
@@ -76,6 +79,7 @@ def route(request: RequestParams, individual_id):
         requested_granularity=request.query.requested_granularity,
         include_datasets=request.query.include_resultset_responses,
         dataset_samples=samples,
+        user_group=request._user_group,
     )
 
     for query_response in query_responses:
@@ -85,8 +89,7 @@ def route(request: RequestParams, individual_id):
             if check_all:
                 variants.update(query_response.variants)
 
-                for variant in query_response.variants:
-                    chrom, pos, ref, alt, typ = variant.split("\t")
+                for chrom, pos, ref, alt, typ in query_response.variants:
                     idx = f"{pos}_{ref}_{alt}"
                     variant_call_counts[idx] += query_response.call_count
                     variant_allele_counts[idx] += query_response.all_alleles_count
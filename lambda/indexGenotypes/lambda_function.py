@@ -0,0 +1,91 @@
+import json
+import os
+import subprocess
+
+import boto3
+
+from shared.genotypes import (
+    SidecarWriter,
+    decode_genotype_string,
+    parse_info,
+    sidecar_key,
+)
+from shared.utils import clear_tmp
+
+
+VARIANTS_BUCKET = os.environ["VARIANTS_BUCKET"]
+SIDECAR_PATH = "/tmp/genotypes.sbgt"
+
+s3 = boto3.client("s3")
+
+
+def get_vcf_etag(vcf_location):
+    bucket, key = vcf_location[5:].split("/", 1)
+    return s3.head_object(Bucket=bucket, Key=key)["ETag"]
+
+
+def list_samples(vcf_location):
+    args = ["bcftools", "query", "--list-samples", vcf_location]
+    output = subprocess.check_output(args, cwd="/tmp", encoding="ascii")
+    return [sample for sample in output.split("\n") if sample]
+
+
+def build_sidecar(vcf_location):
+    writer = SidecarWriter(
+        SIDECAR_PATH,
+        list_samples(vcf_location),
+        vcf_location,
+        get_vcf_etag(vcf_location),
+    )
+    args = [
+        "bcftools",
+        "query",
+        "--format",
+        "%CHROM\t%POS\t%REF\t%ALT\t%INFO\t[%GT,]\n",
+        vcf_location,
+    ]
+    query_process = subprocess.Popen(
+        args, stdout=subprocess.PIPE, cwd="/tmp", encoding="ascii"
+    )
+
+    for line in query_process.stdout:
+        contig, pos, ref, alts, info, genotypes = line.rstrip("\n").split("\t")
+        alt_counts, total_count, variant_type = parse_info(info)
+        writer.add_record(
+            contig,
+            int(pos),
+            ref,
+            alts.split(","),
+            variant_type,
+            decode_genotype_string(genotypes),
+            alt_counts,
+            total_count,
+        )
+    query_process.stdout.close()
+    assert query_process.wait() == 0, f"bcftools failed on {vcf_location}"
+
+    return writer.close()
+
+
+def lambda_handler(event, context):
+    print("Event Received: {}".format(json.dumps(event)))
+    try:
+        message = json.loads(event["Records"][0]["Sns"]["Message"])
+        print("using sns event")
+    except:
+        message = event
+        print("using invoke event")
+
+    vcf_location = message["vcfLocation"]
+    key = sidecar_key(vcf_location)
+
+    try:
+        path = build_sidecar(vcf_location)
+        print(f"Uploading genotype sidecar to s3://{VARIANTS_BUCKET}/{key}")
+        s3.upload_file(path, VARIANTS_BUCKET, key)
+    finally:
+        clear_tmp()
+
+
+if __name__ == "__main__":
+    pass
@@ -10,6 +10,7 @@ import boto3
 from shared.dynamodb import Descendants, Anscestors, Ontology
 from shared.ontoutils import request_hierarchy
 from shared.apiutils import bundle_response
+from shared.athena import bump_generation, wait_for_query
 from shared.utils import ENV_ATHENA, ENV_SNS
 from ctas_queries import QUERY as CTAS_TEMPLATE
 from generate_query_index import QUERY as INDEX_QUERY
@@ -128,25 +129,20 @@ def update_athena_partitions(table):
     )
 
 
-def await_result(execution_id, sleep=2):
-    retries = 0
-    while True:
-        exec = athena.get_query_execution(QueryExecutionId=execution_id)
-        status = exec["QueryExecution"]["Status"]["State"]
+def await_result(execution_id, timeout=120):
+    try:
+        # ctas and index queries can outlast the wait, they finish on their own
+        exec = wait_for_query(execution_id, timeout=timeout, stop=False)
+    except TimeoutError as e:
+        print(e)
+        return []
+    status = exec["Status"]["State"]
 
-        if status in ("QUEUED", "RUNNING"):
-            time.sleep(sleep)
-            retries += 1
-
-            if retries == 60:
-                print("Timed out")
-                return []
-            continue
-        elif status in ("FAILED", "CANCELLED"):
-            print("Error: ", exec["QueryExecution"]["Status"])
-            raise Exception("Error: " + str(exec["QueryExecution"]["Status"]))
-        elif status == "SUCCEEDED":
-            return
+    if status in ("FAILED", "CANCELLED"):
+        print("Error: ", exec["Status"])
+        raise Exception("Error: " + str(exec["Status"]))
+    elif status == "SUCCEEDED":
+        return
 
 
 def drop_tables(table):
@@ -368,6 +364,8 @@ def lambda_handler(event, context):
         index_thread.join()
         relations_thread.join()
 
+    # cached athena results of the previous index are not used again
+    bump_generation()
     print("Indexing complete!")
 
 
@@ -1,7 +1,7 @@
 import json
 
 from shared.utils import clear_tmp
-from query_engine import perform_query
+from shared.variantquery import perform_query, CACHE_DIR
 
 
 def lambda_handler(event, context):
@@ -15,7 +15,8 @@ def lambda_handler(event, context):
         print("using invoke event")
 
     response = perform_query(event, is_async)
-    clear_tmp()
+    # cached blocks are kept for the next invocation of this container
+    clear_tmp(keep=[CACHE_DIR])
     return response
 
 
@@ -1,4 +1,3 @@
-from concurrent.futures import ThreadPoolExecutor
 import json
 import os
 from typing import List
@@ -7,33 +6,116 @@ import base64
 
 import boto3
 
-from shared.utils import LambdaClient
+from shared.dynamodb import QueryCancellation, put_response_page
+from shared.payloads import VariantColumns, unpack_payloads
+from shared.utils import LambdaFanOut, HedgePolicy
 
 
 PERFORM_QUERY = os.environ["PERFORM_QUERY_LAMBDA"]
+VARIANTS_BUCKET = os.environ["VARIANTS_BUCKET"]
 THREADS = 50
 
 
-aws_lambda = LambdaClient()
 sns = boto3.client("sns")
+# a slow region, eg. a cold start or a slow s3 read, is queried again
+# instead of holding up the whole fan out
+hedging = HedgePolicy()
+
+
+def skipped_response(payload: dict):
+    return {
+        "dataset_id": payload["dataset_id"],
+        "exists": False,
+        "all_alleles_count": 0,
+        "variants": VariantColumns().dump(),
+        "call_count": 0,
+        "sample_names": [],
+    }
+
+
+def submit_queries(fan_out: LambdaFanOut, payloads: List[dict]):
+    cancellation = None
+
+    # payloads of a fan out share the query id and granularity
+    if payloads and payloads[0].get("requested_granularity") == "boolean":
+        cancellation = QueryCancellation(payloads[0]["query_id"])
+
+    for n, payload in enumerate(payloads):
+        fan_out.submit(
+            n,
+            # skip payloads of a boolean query that was already answered
+            skip=cancellation.is_cancelled if cancellation else None,
+            FunctionName=PERFORM_QUERY,
+            InvocationType="RequestResponse",
+            Payload=json.dumps(payload),
+        )
+    return cancellation
+
+
+def check_hit(result, cancellation: QueryCancellation, fan_out: LambdaFanOut):
+    if (
+        cancellation is not None
+        and isinstance(result, (list, dict))
+        and any(
+            r.get("exists")
+            for r in (result if isinstance(result, list) else [result])
+        )
+    ):
+        cancellation.cancel()
+        fan_out.cancel()
 
 
-def perform_query(payload: dict):
-    response = aws_lambda.invoke(
-        FunctionName=PERFORM_QUERY,
-        InvocationType="RequestResponse",
-        Payload=json.dumps(payload),
-    )
+# TODO if the response is too big upload to S3
+def split_query(payloads: List[dict], is_async: bool = False):
+    results = [None] * len(payloads)
 
-    return json.loads(response["Payload"].read())
+    with LambdaFanOut(THREADS) as fan_out:
+        cancellation = submit_queries(fan_out, payloads)
 
+        for n, result in fan_out.as_completed(hedging=hedging):
+            check_hit(result, cancellation, fan_out)
+            results[n] = result
 
-# TODO if the response is too big upload to S3
-def split_query(payloads: List[dict], is_async: bool = False):
-    executor = ThreadPoolExecutor(THREADS)
-    futures = [executor.submit(perform_query, payload) for payload in payloads]
+    responses = []
+
+    # payloads with several regions return one result per region
+    for payload, result in zip(payloads, results):
+        result = result or skipped_response(payload)
+        if isinstance(result, list):
+            responses += result
+        else:
+            responses.append(result)
+
+    return responses
 
-    return [future.result() for future in futures]
+
+# writes the results of every payload to the responses table as soon as
+# it is answered, payloads are numbered from offset across the fan out
+def stream_query(payloads: List[dict], offset: int):
+    with LambdaFanOut(THREADS) as fan_out:
+        cancellation = submit_queries(fan_out, payloads)
+
+        for n, result in fan_out.as_completed(
+            return_exceptions=True, hedging=hedging
+        ):
+            if isinstance(result, Exception):
+                print("Error occured ", result)
+                result = {"errorMessage": str(result)}
+            check_hit(result, cancellation, fan_out)
+
+            # nobody waits for payloads skipped after the answer was found
+            if result is None:
+                continue
+            # a failed performQuery invocation returns its error instead
+            if isinstance(result, dict) and "errorMessage" in result:
+                page = {"error": result["errorMessage"]}
+            else:
+                page = result if isinstance(result, list) else [result]
+            put_response_page(
+                payloads[n]["query_id"], offset + n, page, VARIANTS_BUCKET
+            )
+
+    return {"streamed": len(payloads)}
 
 
 def lambda_handler(event, context):
@@ -46,11 +128,16 @@ def lambda_handler(event, context):
         is_async = False
     
     # if gzipped
-    if not isinstance(event, list):
+    if isinstance(event, str):
         event = base64.b64decode(event.encode())
         event = gzip.decompress(event)
         event = json.loads(event)
     print("Event Received: {}".format(json.dumps(event)))
+
+    # streamed fan outs write their results to the responses table
+    if isinstance(event, dict) and event.get("stream"):
+        return stream_query(unpack_payloads(event), event["offset"])
+
     response = split_query(event, is_async)
     return response
 
@@ -11,12 +11,21 @@ from util import get_vcf_chromosome_maps
 from shared.utils import clear_tmp
 from shared.apiutils import build_bad_request, bundle_response
 from shared.dynamodb import Dataset as DynamoDataset
-from shared.athena import Dataset, Cohort, Individual, Biosample, Run, Analysis
+from shared.athena import (
+    Dataset,
+    Cohort,
+    Individual,
+    Biosample,
+    Run,
+    Analysis,
+    bump_generation,
+)
 
 
 DATASETS_TABLE_NAME = os.environ["DYNAMO_DATASETS_TABLE"]
 SUMMARISE_DATASET_SNS_TOPIC_ARN = os.environ["SUMMARISE_DATASET_SNS_TOPIC_ARN"]
 INDEXER_LAMBDA = os.environ["INDEXER_LAMBDA"]
+INDEX_GENOTYPES_SNS_TOPIC_ARN = os.environ["INDEX_GENOTYPES_SNS_TOPIC_ARN"]
 
 # uncomment below for debugging
 # os.environ['LD_DEBUG'] = 'all'
@@ -32,6 +41,7 @@ def create_dataset(attributes, vcf_chromosome_maps):
     datasetId = attributes.get("datasetId", None)
     cohortId = attributes.get("cohortId", None)
     index = attributes.get("index", False)
+    index_genotypes = attributes.get("indexGenotypes", False)
     global pending, completed
     threads = []
 
@@ -124,6 +134,10 @@ def create_dataset(attributes, vcf_chromosome_maps):
     [thread.join() for thread in threads]
     print("Upload finished")
 
+    # cached athena results predate the uploaded rows, the indexer bumps
+    # the generation again once its tables are rebuilt
+    bump_generation()
+
     if index:
         aws_lambda.invoke(
             FunctionName=INDEXER_LAMBDA,
@@ -132,6 +146,11 @@ def create_dataset(attributes, vcf_chromosome_maps):
         )
         pending.append("Running indexer")
 
+    if index_genotypes:
+        for vcf_location in attributes.get("vcfLocations", []):
+            index_genotypes_vcf(vcf_location)
+        pending.append("Indexing genotypes")
+
 
 def submit_dataset(body_dict):
     global pending, completed
@@ -163,6 +182,16 @@ def summarise_dataset(dataset):
     print("Received Response: {}".format(json.dumps(response)))
 
 
+def index_genotypes_vcf(vcf_location):
+    kwargs = {
+        "TopicArn": INDEX_GENOTYPES_SNS_TOPIC_ARN,
+        "Message": json.dumps({"vcfLocation": vcf_location}),
+    }
+    print("Publishing to SNS: {}".format(json.dumps(kwargs)))
+    response = sns.publish(**kwargs)
+    print("Received Response: {}".format(json.dumps(response)))
+
+
 def validate_request(parameters):
     # load validator
     new_schema = "./schemas/submit-dataset-schema-new.json"
@@ -5,7 +5,7 @@ import os
 import boto3
 from botocore.exceptions import ClientError
 
-from index_reader import Csi, Tbi
+from shared.vcfindex import Csi, Tbi
 
 COUNTS = [
     "variantCount",
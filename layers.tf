@@ -16,7 +16,7 @@ resource "aws_lambda_layer_version" "binaries_layer" {
 }
 
 ### python thirdparty libraries layer 
-# contains pynamodb, jsons, jsonschema, smart_open
+# contains pynamodb, jsons, jsonschema, smart_open, pysam, numpy
 module "python_libraries_layer" {
   source = "terraform-aws-modules/lambda/aws"
 
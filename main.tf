@@ -48,6 +48,11 @@ locals {
     BEACON_ENABLE_AUTH = var.beacon-enable-auth
     # configurations
     CONFIG_MAX_VARIANT_SEARCH_BASE_RANGE = var.config-max-variant-search-base-range
+    CONFIG_VARIANT_QUERY_READER          = var.config-variant-query-reader
+    CONFIG_VARIANT_QUERY_CACHE_SIZE      = var.config-variant-query-cache-size
+    CONFIG_MAX_VARIANT_QUERY_CONCURRENCY = var.config-max-variant-query-concurrency
+    CONFIG_VARIANT_QUERY_LOCAL_THRESHOLD = var.config-variant-query-local-threshold
+    CONFIG_ATHENA_COLUMNAR_RESULTS       = var.config-athena-columnar-results
   }
   # athena related variables
   athena_variables = {
@@ -81,6 +86,7 @@ locals {
     DYNAMO_ONTOLOGIES_TABLE              = aws_dynamodb_table.ontologies.name
     DYNAMO_ANSCESTORS_TABLE              = aws_dynamodb_table.anscestor_terms.name
     DYNAMO_DESCENDANTS_TABLE             = aws_dynamodb_table.descendant_terms.name
+    DYNAMO_CONCURRENCY_BUDGETS_TABLE     = aws_dynamodb_table.concurrency_budgets.name
   }
   # layers
   binaries_layer         = "${aws_lambda_layer_version.binaries_layer.layer_arn}:${aws_lambda_layer_version.binaries_layer.version}"
@@ -117,6 +123,7 @@ module "lambda-submitDataset" {
       DYNAMO_DATASETS_TABLE           = aws_dynamodb_table.datasets.name
       SUMMARISE_DATASET_SNS_TOPIC_ARN = aws_sns_topic.summariseDataset.arn
       INDEXER_LAMBDA                  = module.lambda-indexer.lambda_function_name
+      INDEX_GENOTYPES_SNS_TOPIC_ARN   = aws_sns_topic.indexGenotypes.arn
     },
     local.sbeacon_variables,
     local.athena_variables,
@@ -186,7 +193,37 @@ module "lambda-summariseVcf" {
   }
 
   layers = [
-    local.python_libraries_layer
+    local.python_libraries_layer,
+    local.python_modules_layer
+  ]
+}
+
+#
+# indexGenotypes Lambda Function
+#
+module "lambda-indexGenotypes" {
+  source = "terraform-aws-modules/lambda/aws"
+
+  function_name          = "indexGenotypes"
+  description            = "Writes the bit-packed genotype sidecar of a vcf."
+  handler                = "lambda_function.lambda_handler"
+  runtime                = "python3.9"
+  memory_size            = 3008
+  timeout                = 900
+  ephemeral_storage_size = 10240
+  attach_policy_json     = true
+  policy_json            = data.aws_iam_policy_document.lambda-indexGenotypes.json
+  source_path            = "${path.module}/lambda/indexGenotypes"
+  tags                   = var.common-tags
+
+  environment_variables = {
+    VARIANTS_BUCKET = aws_s3_bucket.variants-bucket.bucket
+  }
+
+  layers = [
+    local.binaries_layer,
+    local.python_libraries_layer,
+    local.python_modules_layer
   ]
 }
 
@@ -476,6 +513,8 @@ module "lambda-getAnalyses" {
   environment_variables = merge(
     {
       SPLIT_QUERY_LAMBDA    = module.lambda-splitQuery.lambda_function_name,
+      PERFORM_QUERY_LAMBDA  = module.lambda-performQuery.lambda_function_name,
+      VARIANTS_BUCKET       = aws_s3_bucket.variants-bucket.bucket,
       SPLIT_QUERY_TOPIC_ARN = aws_sns_topic.splitQuery.arn
     },
     local.athena_variables,
@@ -484,6 +523,7 @@ module "lambda-getAnalyses" {
   )
 
   layers = [
+    local.binaries_layer,
     local.python_libraries_layer,
     local.python_modules_layer
   ]
@@ -515,6 +555,8 @@ module "lambda-getGenomicVariants" {
   environment_variables = merge(
     {
       SPLIT_QUERY_LAMBDA    = module.lambda-splitQuery.lambda_function_name,
+      PERFORM_QUERY_LAMBDA  = module.lambda-performQuery.lambda_function_name,
+      VARIANTS_BUCKET       = aws_s3_bucket.variants-bucket.bucket,
       SPLIT_QUERY_TOPIC_ARN = aws_sns_topic.splitQuery.arn
     },
     local.athena_variables,
@@ -523,6 +565,7 @@ module "lambda-getGenomicVariants" {
   )
 
   layers = [
+    local.binaries_layer,
     local.python_libraries_layer,
     local.python_modules_layer
   ]
@@ -554,6 +597,8 @@ module "lambda-getIndividuals" {
   environment_variables = merge(
     {
       SPLIT_QUERY_LAMBDA    = module.lambda-splitQuery.lambda_function_name,
+      PERFORM_QUERY_LAMBDA  = module.lambda-performQuery.lambda_function_name,
+      VARIANTS_BUCKET       = aws_s3_bucket.variants-bucket.bucket,
       SPLIT_QUERY_TOPIC_ARN = aws_sns_topic.splitQuery.arn
     },
     local.athena_variables,
@@ -562,6 +607,7 @@ module "lambda-getIndividuals" {
   )
 
   layers = [
+    local.binaries_layer,
     local.python_libraries_layer,
     local.python_modules_layer
   ]
@@ -593,6 +639,8 @@ module "lambda-getBiosamples" {
   environment_variables = merge(
     {
       SPLIT_QUERY_LAMBDA    = module.lambda-splitQuery.lambda_function_name,
+      PERFORM_QUERY_LAMBDA  = module.lambda-performQuery.lambda_function_name,
+      VARIANTS_BUCKET       = aws_s3_bucket.variants-bucket.bucket,
       SPLIT_QUERY_TOPIC_ARN = aws_sns_topic.splitQuery.arn
     },
     local.athena_variables,
@@ -601,6 +649,7 @@ module "lambda-getBiosamples" {
   )
 
   layers = [
+    local.binaries_layer,
     local.python_libraries_layer,
     local.python_modules_layer
   ]
@@ -632,6 +681,8 @@ module "lambda-getDatasets" {
   environment_variables = merge(
     {
       SPLIT_QUERY_LAMBDA    = module.lambda-splitQuery.lambda_function_name,
+      PERFORM_QUERY_LAMBDA  = module.lambda-performQuery.lambda_function_name,
+      VARIANTS_BUCKET       = aws_s3_bucket.variants-bucket.bucket,
       SPLIT_QUERY_TOPIC_ARN = aws_sns_topic.splitQuery.arn
     },
     local.athena_variables,
@@ -640,6 +691,7 @@ module "lambda-getDatasets" {
   )
 
   layers = [
+    local.binaries_layer,
     local.python_libraries_layer,
     local.python_modules_layer
   ]
@@ -709,6 +761,8 @@ module "lambda-getRuns" {
   environment_variables = merge(
     {
       SPLIT_QUERY_LAMBDA    = module.lambda-splitQuery.lambda_function_name,
+      PERFORM_QUERY_LAMBDA  = module.lambda-performQuery.lambda_function_name,
+      VARIANTS_BUCKET       = aws_s3_bucket.variants-bucket.bucket,
       SPLIT_QUERY_TOPIC_ARN = aws_sns_topic.splitQuery.arn
     },
     local.athena_variables,
@@ -717,6 +771,7 @@ module "lambda-getRuns" {
   )
 
   layers = [
+    local.binaries_layer,
     local.python_libraries_layer,
     local.python_modules_layer
   ]
@@ -739,10 +794,12 @@ module "lambda-splitQuery" {
   source_path        = "${path.module}/lambda/splitQuery"
   tags               = var.common-tags
 
-  environment_variables = {
+  environment_variables = merge({
     PERFORM_QUERY_LAMBDA    = module.lambda-performQuery.lambda_function_name,
     PERFORM_QUERY_TOPIC_ARN = aws_sns_topic.performQuery.arn
-  }
+    VARIANTS_BUCKET         = aws_s3_bucket.variants-bucket.bucket
+    },
+  local.dynamodb_variables)
 
   layers = [
     local.python_libraries_layer,
@@ -36,6 +36,20 @@ resource "aws_s3_bucket_lifecycle_configuration" "variants_bucket_lifecycle" {
       days = 1
     }
   }
+
+  # sample lists of filtered variant searches, uploaded again every day
+  rule {
+    id     = "clean-old-sample-lists"
+    status = "Enabled"
+
+    filter {
+      prefix = "sample-lists/"
+    }
+
+    expiration {
+      days = 7
+    }
+  }
 }
 
 # 
@@ -89,6 +103,34 @@ resource "aws_s3_bucket_lifecycle_configuration" "metadata_bucket_lifecycle" {
       days = 2
     }
   }
+
+  # orc results of unload queries, listed by manifests in query-results/
+  rule {
+    id     = "clean-old-unloaded-results"
+    status = "Enabled"
+
+    filter {
+      prefix = "query-unload/"
+    }
+
+    expiration {
+      days = 2
+    }
+  }
+
+  # athena results cached by query, each kept for a day
+  rule {
+    id     = "clean-old-athena-cache"
+    status = "Enabled"
+
+    filter {
+      prefix = "query-cache/"
+    }
+
+    expiration {
+      days = 2
+    }
+  }
 }
 
 # 
@@ -194,6 +194,8 @@ class RequestQuery(CamelModel):
 class RequestParams(CamelModel):
     meta: RequestMeta = RequestMeta()
     query: RequestQuery = RequestQuery()
+    # cognito groups of the caller, None without a signed in user
+    _user_group: Optional[str] = PrivateAttr(default=None)
 
     # TODO update to parse body of API gateway POST and GET requests
     # CHANGE: parse API gateway request
@@ -263,14 +265,21 @@ def parse_request(event) -> Tuple[RequestParams, str]:
 
         return request_params, dict({k: list(v) for k, v in errors.items()}), 400
 
+    claims = (
+        event.get("requestContext", dict())
+        .get("authorizer", dict())
+        .get("claims", dict())
+    )
+
+    # large variant searches share the concurrency budget by caller group
+    if claims.get("cognito:groups"):
+        request_params._user_group = ",".join(
+            sorted(claims["cognito:groups"].split(","))
+        )
+
     if BEACON_ENABLE_AUTH:
         # either use belongs to a group or they are unauthorized
-        groups = (
-            event.get("requestContext", dict())
-            .get("authorizer", dict())
-            .get("claims", dict())
-            .get("cognito:groups", "unauthorized")
-        )
+        groups = claims.get("cognito:groups", "unauthorized")
         groups = groups.split(",")
         authorized = (
             f"{request_params.query.requested_granularity}-access-user-group" in groups
@@ -1,6 +1,8 @@
 from .dataset import Dataset, parse_datasets_with_samples
 from .filters import entity_search_conditions
 from .common import AthenaModel, run_custom_query
+from .result_cache import bump_generation
+from .query_waiter import wait_for_query, query_shape
 from .individual import Individual
 from .biosample import Biosample
 from .analysis import Analysis
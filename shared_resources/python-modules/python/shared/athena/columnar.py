@@ -0,0 +1,131 @@
+import re
+import uuid
+
+import pyorc
+from smart_open import open as sopen
+
+from shared.utils import ENV_ATHENA
+from .decoders import json_value, maybe_json_value, model_defaults
+
+
+UNLOAD_PREFIX = "query-unload/"
+order_by = re.compile(r"\sORDER\s+BY\s", re.I)
+order_end = re.compile(r"\s(?:OFFSET|LIMIT)\s|;", re.I)
+order_column = re.compile(r'(?:\w+\.)?"?(\w+)"?(?:\s+(ASC|DESC))?', re.I)
+
+
+def unload_query(query):
+    # every unload writes to a fresh prefix, athena requires it to be empty
+    location = (
+        f"s3://{ENV_ATHENA.ATHENA_METADATA_BUCKET}/{UNLOAD_PREFIX}{uuid.uuid4().hex}/"
+    )
+    query = query.strip().rstrip(";")
+
+    return f"UNLOAD ({query}) TO '{location}' WITH (format = 'ORC')"
+
+
+def sort_order(query):
+    """
+    (column, descending) pairs of the ORDER BY of a query, empty when the
+    results are unordered and None when they are ordered by anything but
+    plain columns, which cannot be restored across unloaded files.
+    """
+    clauses = order_by.split(query)
+    # an order inside a subquery does not order the results
+    if len(clauses) == 1 or clauses[-1].count(")") > clauses[-1].count("("):
+        return []
+
+    order = []
+
+    for term in order_end.split(clauses[-1], 1)[0].split(","):
+        match = order_column.fullmatch(term.strip())
+
+        if match is None:
+            return None
+        column, direction = match.groups()
+        order.append((column.lower(), (direction or "").upper() == "DESC"))
+    return order
+
+
+def sort_rows(rows, order):
+    """
+    Sorts (plan, row) pairs on their raw values, nulls last as in athena.
+    Columns missing from the results cannot be sorted on and are skipped.
+    """
+    names = [name for name, _ in rows[0][0]] if rows else []
+
+    # stable sorts from the last column to the first
+    for column, descending in reversed(order):
+        if column not in names:
+            continue
+        index = names.index(column)
+
+        if descending:
+            rows.sort(
+                key=lambda pair: (pair[1][index] is not None, pair[1][index]),
+                reverse=True,
+            )
+        else:
+            rows.sort(key=lambda pair: (pair[1][index] is None, pair[1][index]))
+    return rows
+
+
+def decoder_plan(cls, schema):
+    """
+    Decoder of each result column. Columns of other orc types are read as
+    they are. String columns of the model holding objects or lists are
+    json, other strings are parsed only if they look like json.
+    """
+    defaults = model_defaults(cls)
+    columns = {column.lower(): column for column in cls._table_columns}
+    plan = []
+
+    for name, column_type in schema.fields.items():
+        column = columns.get(name)
+
+        if column_type.kind != pyorc.TypeKind.STRING:
+            plan.append((name, None))
+        elif column is not None and isinstance(defaults.get(column), (dict, list)):
+            plan.append((name, json_value))
+        else:
+            plan.append((name, maybe_json_value))
+    return plan
+
+
+def read_unloaded(cls, exec_id, order=()):
+    """
+    Yields the rows written by an unload query as dicts keyed by lower
+    case column name, the files are listed in the manifest athena writes
+    next to the query results. Each file is sorted on its own, so rows of
+    several files are sorted again by order, see sort_order.
+    """
+    with sopen(
+        f"s3://{ENV_ATHENA.ATHENA_METADATA_BUCKET}/query-results/{exec_id}-manifest.csv"
+    ) as manifest:
+        locations = [line.strip() for line in manifest if line.strip()]
+
+    rows = (pair for location in locations for pair in read_orc(cls, location))
+
+    if order and len(locations) > 1:
+        rows = sort_rows(list(rows), order)
+
+    # nulls of string columns read as empty, like in the csv results
+    for plan, row in rows:
+        yield {
+            name: value if decode is None else decode(value or "")
+            for (name, decode), value in zip(plan, row)
+        }
+
+
+def read_orc(cls, location):
+    # rows of a file as they are stored, with the decoders of its columns
+    with sopen(location, "rb") as orc_file:
+        reader = pyorc.Reader(orc_file)
+        plan = decoder_plan(cls, reader.schema)
+
+        for row in reader:
+            yield plan, row
+
+
+if __name__ == "__main__":
+    pass
@@ -1,17 +1,27 @@
-import time
+from concurrent.futures import ThreadPoolExecutor
 import re
 import csv
-import json
 
 import boto3
 from smart_open import open as sopen
 
 from shared.ontoutils import get_ontology_details
-from shared.utils import ENV_ATHENA
+from shared.utils import ENV_ATHENA, ENV_CONFIG
+from .result_cache import cache_key, get_cached, put_cached
+from .query_waiter import wait_for_query, query_shape
+from .columnar import unload_query, read_unloaded, sort_order
+from .decoders import header_plan, model_defaults, new_instance
 
 
 athena = boto3.client("athena")
 pattern = re.compile(r"^\w[^:]+:.+$")
+# bytes of csv results fetched from s3 at a time
+READ_BUFFER_SIZE = 1024 * 1024
+# total of a page queried with get_by_query_with_count
+TOTAL_COLUMN = "_total_count"
+select_list = re.compile(r"\s*SELECT\s.*?(?=\s+FROM\s)", re.I | re.S)
+distinct = re.compile(r"\s*SELECT\s+DISTINCT\s", re.I)
+group_by = re.compile(r"\sGROUP\s+BY\s", re.I)
 
 # Perform database level operations based on the queries
 
@@ -31,15 +41,20 @@ class AthenaModel:
     @classmethod
     def get_by_query(cls, query, /, *, queue=None, execution_parameters=None):
         query = query.format(database=ENV_ATHENA.ATHENA_METADATA_DATABASE, table=cls._table_name)
+        order = sort_order(query)
         exec_id = run_custom_query(
-            query, queue=None, return_id=True, execution_parameters=execution_parameters
+            query,
+            queue=None,
+            return_id=True,
+            execution_parameters=execution_parameters,
+            columnar=order is not None,
         )
 
         if exec_id:
             if queue is None:
-                return cls.parse_array(exec_id)
+                return cls.parse_array(exec_id, order=order)
             else:
-                queue.put(cls.parse_array(exec_id))
+                queue.put(cls.parse_array(exec_id, order=order))
         return []
 
     @classmethod
@@ -57,30 +72,122 @@ class AthenaModel:
             queue.put(len(result) > 1)
 
     @classmethod
-    def parse_array(cls, exec_id):
-        instances = []
-        var_list = list()
-        case_map = {k.lower(): k for k in cls().__dict__.keys()}
+    def iter_by_query(cls, query, /, *, execution_parameters=None):
+        """
+        Like get_by_query, but yields the instances while the results are
+        read, so large pages and exports are never held in memory whole.
+        """
+        query = query.format(database=ENV_ATHENA.ATHENA_METADATA_DATABASE, table=cls._table_name)
+        order = sort_order(query)
+        exec_id = run_custom_query(
+            query,
+            queue=None,
+            return_id=True,
+            execution_parameters=execution_parameters,
+            columnar=order is not None,
+        )
+
+        if exec_id:
+            yield from cls.iter_array(exec_id, order=order)
 
-        with sopen(f"s3://{ENV_ATHENA.ATHENA_METADATA_BUCKET}/query-results/{exec_id}.csv") as s3f:
+    @classmethod
+    def get_by_query_with_count(
+        cls, query, count_query, /, *, skip=0, execution_parameters=None
+    ):
+        """
+        A page of records and the total count of the records matching the
+        query, both from a single execution. The total is a window count
+        added to the select list, so it is taken before OFFSET and LIMIT.
+        Queries it cannot be added to, and pages past the last record,
+        use count_query as well.
+        """
+        match = select_list.match(query)
+
+        if match is None or distinct.match(query) or group_by.search(query):
+            executor = ThreadPoolExecutor(2)
+            record_future = executor.submit(
+                cls.get_by_query, query, execution_parameters=execution_parameters
+            )
+            count_future = executor.submit(
+                cls.get_count_by_query,
+                count_query,
+                execution_parameters=execution_parameters,
+            )
+            executor.shutdown()
+            return record_future.result(), count_future.result()
+
+        query = (
+            query[: match.end()]
+            + f", COUNT(*) OVER () AS {TOTAL_COLUMN}"
+            + query[match.end() :]
+        )
+        query = query.format(database=ENV_ATHENA.ATHENA_METADATA_DATABASE, table=cls._table_name)
+        order = sort_order(query)
+        exec_id = run_custom_query(
+            query,
+            queue=None,
+            return_id=True,
+            execution_parameters=execution_parameters,
+            columnar=order is not None,
+        )
+        instances = (
+            cls.parse_array(exec_id, extra_columns=(TOTAL_COLUMN,), order=order)
+            if exec_id
+            else []
+        )
+
+        if instances:
+            count = int(instances[0].__dict__[TOTAL_COLUMN])
+            for instance in instances:
+                del instance.__dict__[TOTAL_COLUMN]
+        elif exec_id and skip == 0:
+            count = 0
+        else:
+            # rows past the end carry no total
+            count = cls.get_count_by_query(
+                count_query, execution_parameters=execution_parameters
+            )
+        return instances, count
+
+    @classmethod
+    def parse_array(cls, exec_id, extra_columns=(), order=()):
+        return list(cls.iter_array(exec_id, extra_columns, order))
+
+    @classmethod
+    def iter_array(cls, exec_id, extra_columns=(), order=()):
+        """
+        Yields the instances in the results of a query, extra columns are
+        kept as attributes of the same name. order is the sort_order of
+        the query, queries it is None for were not unloaded.
+        """
+        if order is not None and ENV_CONFIG.CONFIG_ATHENA_COLUMNAR_RESULTS:
+            case_map = {k.lower(): k for k in model_defaults(cls)}
+            case_map.update({column: column for column in extra_columns})
+
+            for row in read_unloaded(cls, exec_id, order):
+                values = {
+                    case_map[attr]: val for attr, val in row.items() if attr in case_map
+                }
+                yield new_instance(cls, values)
+            return
+
+        # the csv is read from s3 in chunks as rows are consumed
+        with sopen(
+            f"s3://{ENV_ATHENA.ATHENA_METADATA_BUCKET}/query-results/{exec_id}.csv",
+            transport_params={"buffer_size": READ_BUFFER_SIZE},
+        ) as s3f:
             reader = csv.reader(s3f)
+            header = next(reader, None)
 
-            for n, row in enumerate(reader):
-                if n == 0:
-                    var_list = row
-                else:
-                    instance = cls()
-                    for attr, val in zip(var_list, row):
-                        if not attr in case_map:
-                            continue
-                        try:
-                            val = json.loads(val)
-                        except:
-                            val = val
-                        instance.__dict__[case_map[attr]] = val
-                    instances.append(instance)
-
-        return instances
+            if header is None:
+                return
+            # decoders are chosen once per model and header
+            plan = header_plan(cls, tuple(header), tuple(extra_columns))
+
+            for row in reader:
+                yield new_instance(
+                    cls, {attr: decode(row[index]) for index, attr, decode in plan}
+                )
 
     @classmethod
     def get_count_by_query(cls, query, /, *, queue=None, execution_parameters=None):
@@ -126,10 +233,43 @@ def run_custom_query(
     queue=None,
     return_id=False,
     execution_parameters=None,
+    use_cache=True,
+    timeout=30,
+    columnar=False,
 ):
     query = query.replace("\n", " ")
     print(f"{query=}")
     print(f"{execution_parameters=}")
+    # results read with read_unloaded are written as orc instead of csv
+    columnar = columnar and return_id and ENV_CONFIG.CONFIG_ATHENA_COLUMNAR_RESULTS
+
+    # identical queries against the same index are answered from the cache
+    key = None
+
+    if use_cache:
+        try:
+            key = cache_key(
+                query,
+                database=database,
+                workgroup=workgroup,
+                return_id=return_id,
+                execution_parameters=execution_parameters,
+                columnar=columnar,
+            )
+            cached = get_cached(key)
+        except Exception as e:
+            print("Unable to look up cached athena results\n", e)
+            cached = None
+
+        if cached is not None:
+            result = cached["QueryExecutionId"] if return_id else cached["Rows"]
+
+            if queue is not None:
+                return queue.put(result)
+            return result
+
+    if columnar:
+        query = unload_query(query)
 
     if execution_parameters is None:
         response = athena.start_query_execution(
@@ -147,30 +287,30 @@ def run_custom_query(
             ExecutionParameters=execution_parameters,
         )
 
-    retries = 0
-    while True:
-        exec = athena.get_query_execution(QueryExecutionId=response["QueryExecutionId"])
-        status = exec["QueryExecution"]["Status"]["State"]
-
-        if status in ("QUEUED", "RUNNING"):
-            time.sleep(0.1)
-            retries += 1
+    try:
+        exec = wait_for_query(
+            response["QueryExecutionId"], timeout=timeout, shape=query_shape(query)
+        )
+    except TimeoutError as e:
+        print(e)
+        return None
+    status = exec["Status"]["State"]
 
-            if retries == 300:
-                print("Timed out")
-                return None
-            continue
-        elif status in ("FAILED", "CANCELLED"):
-            print("Error: ", exec["QueryExecution"]["Status"])
-            return None
+    if status in ("FAILED", "CANCELLED"):
+        print("Error: ", exec["Status"])
+        return None
+    else:
+        if return_id:
+            if key:
+                put_cached(key, {"QueryExecutionId": response["QueryExecutionId"]})
+            return response["QueryExecutionId"]
         else:
-            if return_id:
-                return response["QueryExecutionId"]
+            data = athena.get_query_results(
+                QueryExecutionId=response["QueryExecutionId"], MaxResults=1000
+            )
+            if key:
+                put_cached(key, {"Rows": data["ResultSet"]["Rows"]})
+            if queue is not None:
+                return queue.put(data["ResultSet"]["Rows"])
             else:
-                data = athena.get_query_results(
-                    QueryExecutionId=response["QueryExecutionId"], MaxResults=1000
-                )
-                if queue is not None:
-                    return queue.put(data["ResultSet"]["Rows"])
-                else:
-                    return data["ResultSet"]["Rows"]
+                return data["ResultSet"]["Rows"]
@@ -9,7 +9,9 @@ import pyorc
 from smart_open import open as sopen
 
 from .common import AthenaModel, extract_terms
-from shared.utils import ENV_ATHENA
+from .columnar import read_unloaded
+from .decoders import header_plan, model_defaults, new_instance
+from shared.utils import ENV_ATHENA, ENV_CONFIG
 
 
 s3 = boto3.client("s3")
@@ -148,33 +150,40 @@ def parse_datasets_with_samples(exec_id):
     datasets = []
     samples = []
 
-    var_list = list()
-    case_map = {k.lower(): k for k in Dataset().__dict__.keys()}
+    case_map = {k.lower(): k for k in model_defaults(Dataset)}
+
+    if ENV_CONFIG.CONFIG_ATHENA_COLUMNAR_RESULTS:
+        for row in read_unloaded(Dataset, exec_id):
+            # arrays are read as lists, no need to split them
+            if "samples" in row:
+                samples.append(row["samples"])
+            values = {
+                case_map[attr]: val for attr, val in row.items() if attr in case_map
+            }
+            datasets.append(new_instance(Dataset, values))
+        return datasets, samples
 
     with sopen(
         f"s3://{ENV_ATHENA.ATHENA_METADATA_BUCKET}/query-results/{exec_id}.csv"
     ) as s3f:
         reader = csv.reader(s3f)
-
-        for n, row in enumerate(reader):
-            if n == 0:
-                var_list = row
-            else:
-                instance = Dataset()
-                for attr, val in zip(var_list, row):
-                    if attr == "samples":
-                        samples.append(
-                            val.replace("[", "").replace("]", "").split(", ")
-                        )
-                    elif attr not in case_map:
-                        continue
-                    else:
-                        try:
-                            val = json.loads(val)
-                        except:
-                            val = val
-                        instance.__dict__[case_map[attr]] = val
-                datasets.append(instance)
+        header = next(reader, None)
+
+        if header is None:
+            return datasets, samples
+        plan = header_plan(Dataset, tuple(header))
+        samples_index = header.index("samples") if "samples" in header else None
+
+        for row in reader:
+            if samples_index is not None:
+                samples.append(
+                    row[samples_index].replace("[", "").replace("]", "").split(", ")
+                )
+            datasets.append(
+                new_instance(
+                    Dataset, {attr: decode(row[index]) for index, attr, decode in plan}
+                )
+            )
 
     return datasets, samples
 
@@ -0,0 +1,83 @@
+from functools import lru_cache
+import copy
+import json
+
+
+# first characters of json values, NaN and Infinity are accepted by json.loads
+JSON_STARTS = frozenset('[{"-0123456789tfnNI')
+
+
+def json_value(value):
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return value
+
+
+# plain strings are kept without trying to parse them, json.loads also
+# skips leading whitespace so those values are parsed as before
+def maybe_json_value(value):
+    if value and (value[0] in JSON_STARTS or value[0].isspace()):
+        return json_value(value)
+    return value
+
+
+@lru_cache(maxsize=None)
+def model_defaults(cls):
+    # attribute values of a new instance, read once per model
+    return cls().__dict__
+
+
+@lru_cache(maxsize=None)
+def mutable_defaults(cls):
+    # defaults every instance needs its own copy of
+    return tuple(
+        (attr, value)
+        for attr, value in model_defaults(cls).items()
+        if not isinstance(value, (str, int, float, bool, type(None)))
+    )
+
+
+def new_instance(cls, values):
+    """
+    Instance of a model with the given attributes over its defaults,
+    without running __init__ for every row. Defaults holding lists or
+    objects are copied, so rows never share them with each other.
+    """
+    instance = cls.__new__(cls)
+    instance.__dict__.update(model_defaults(cls))
+
+    for attr, value in mutable_defaults(cls):
+        if attr not in values:
+            instance.__dict__[attr] = copy.deepcopy(value)
+    instance.__dict__.update(values)
+    return instance
+
+
+@lru_cache(maxsize=256)
+def header_plan(cls, header, extra_columns=()):
+    """
+    (index, attribute, decoder) of the csv columns that map to attributes
+    of the model or are extra columns, other columns are skipped.
+    Attributes defaulting to an object or a list hold json, others are
+    parsed only if they look like json.
+    """
+    defaults = model_defaults(cls)
+    case_map = {k.lower(): k for k in defaults}
+    case_map.update({column: column for column in extra_columns})
+    plan = []
+
+    for index, column in enumerate(header):
+        attr = case_map.get(column)
+
+        if attr is None:
+            continue
+        if isinstance(defaults.get(attr), (dict, list)):
+            plan.append((index, attr, json_value))
+        else:
+            plan.append((index, attr, maybe_json_value))
+    return tuple(plan)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,142 @@
+from collections import OrderedDict
+import hashlib
+import json
+import re
+import threading
+import time
+
+import boto3
+
+
+MIN_DELAY = 0.05
+MAX_DELAY = 2.0
+# growth of the delay once a query runs past its expected time
+BACKOFF = 1.5
+# weight of the newest observation in the running averages
+SMOOTHING = 0.3
+MAX_SHAPES = 512
+METRICS_NAMESPACE = "sBeacon"
+
+
+athena = boto3.client("athena")
+lock = threading.Lock()
+# shape -> (average queued seconds, average execution seconds)
+shapes = OrderedDict()
+# literals and numbers vary between queries of the same shape
+shape_values = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def query_shape(query):
+    shape = shape_values.sub("?", " ".join(query.split()))
+
+    return hashlib.md5(shape.encode()).hexdigest()
+
+
+def expected_times(shape):
+    with lock:
+        return shapes.get(shape, (None, None))
+
+
+def record_times(shape, queued, executed):
+    with lock:
+        average_queued, average_executed = shapes.pop(shape, (queued, executed))
+        shapes[shape] = (
+            average_queued + SMOOTHING * (queued - average_queued),
+            average_executed + SMOOTHING * (executed - average_executed),
+        )
+
+        while len(shapes) > MAX_SHAPES:
+            shapes.popitem(last=False)
+
+
+def report(execution_id, state, queued, executed):
+    # embedded metric format, cloudwatch turns these log lines into metrics
+    print(
+        json.dumps(
+            {
+                "_aws": {
+                    "Timestamp": int(time.time() * 1000),
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": METRICS_NAMESPACE,
+                            "Dimensions": [["State"]],
+                            "Metrics": [
+                                {"Name": "AthenaQueuedTime", "Unit": "Seconds"},
+                                {"Name": "AthenaExecutionTime", "Unit": "Seconds"},
+                            ],
+                        }
+                    ],
+                },
+                "State": state,
+                "QueryExecutionId": execution_id,
+                "AthenaQueuedTime": queued,
+                "AthenaExecutionTime": executed,
+            }
+        )
+    )
+
+
+def wait_for_query(execution_id, /, *, timeout=30, shape=None, stop=True):
+    """
+    Waits for an athena query to finish and returns its QueryExecution.
+    Polls are timed from earlier queries of the same shape and back off
+    once the query runs past them. At the deadline TimeoutError is raised,
+    the query is stopped first unless stop is False.
+    """
+    start = time.time()
+    deadline = start + timeout
+    expected_queued, expected_executed = expected_times(shape)
+    delay = MIN_DELAY
+    last_state = None
+
+    while True:
+        execution = athena.get_query_execution(QueryExecutionId=execution_id)[
+            "QueryExecution"
+        ]
+        state = execution["Status"]["State"]
+
+        if state not in ("QUEUED", "RUNNING"):
+            break
+
+        now = time.time()
+
+        if now >= deadline:
+            if stop:
+                print(f"Timed out, stopping {execution_id}")
+                athena.stop_query_execution(QueryExecutionId=execution_id)
+            else:
+                print(f"Timed out waiting for {execution_id}, leaving it running")
+            report(execution_id, "TIMEOUT", now - start, 0)
+            raise TimeoutError(f"Query {execution_id} did not finish in {timeout}s")
+
+        # a change of state starts the backoff again from the shortest delay
+        if state != last_state:
+            delay = MIN_DELAY
+            last_state = state
+        expected = None
+
+        if state == "QUEUED" and expected_queued is not None:
+            expected = start + expected_queued
+        elif state == "RUNNING" and expected_executed is not None:
+            expected = start + (expected_queued or 0) + expected_executed
+
+        # the first poll is when similar queries finished, later ones back off
+        if expected is not None and expected > now:
+            sleep = expected - now
+        else:
+            sleep = delay
+            delay = min(MAX_DELAY, delay * BACKOFF)
+        time.sleep(max(MIN_DELAY, min(sleep, MAX_DELAY, deadline - now)))
+
+    statistics = execution.get("Statistics", {})
+    queued = statistics.get("QueryQueueTimeInMillis", 0) / 1000
+    executed = statistics.get("EngineExecutionTimeInMillis", 0) / 1000
+    report(execution_id, state, queued, executed)
+
+    if shape is not None and state == "SUCCEEDED":
+        record_times(shape, queued, executed)
+    return execution
+
+
+if __name__ == "__main__":
+    pass
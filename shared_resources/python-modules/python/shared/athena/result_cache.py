@@ -0,0 +1,173 @@
+from collections import OrderedDict
+import hashlib
+import json
+import re
+import threading
+import time
+
+import boto3
+from botocore.exceptions import ClientError
+
+from shared.utils import ENV_ATHENA
+
+
+CACHE_PREFIX = "query-cache/"
+# bumped by the indexer whenever it rebuilds the tables queried here
+GENERATION_KEY = "index-generation"
+# seconds a container trusts the generation it last read
+GENERATION_TTL = 30
+# results refer to query-results/ of the same bucket, which expire in 2 days
+CACHE_TTL = 24 * 60 * 60
+LOCAL_CACHE_SIZE = 256
+METRICS_NAMESPACE = "sBeacon"
+
+
+s3 = boto3.client("s3")
+lock = threading.Lock()
+# key -> (value, time stored), least recently used first
+local_cache = OrderedDict()
+generation = None
+generation_checked = 0
+stats = {"local": 0, "shared": 0, "miss": 0}
+# string literals are kept as they are, the rest of the query is normalised
+literals = re.compile(r"('(?:[^']|'')*')")
+
+
+def get_generation():
+    global generation, generation_checked
+
+    if time.time() - generation_checked < GENERATION_TTL:
+        return generation
+    try:
+        response = s3.get_object(
+            Bucket=ENV_ATHENA.ATHENA_METADATA_BUCKET, Key=GENERATION_KEY
+        )
+        current = response["Body"].read().decode()
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "NoSuchKey":
+            raise e
+        current = "0"
+
+    with lock:
+        # results of an older index are never looked up again
+        if current != generation:
+            local_cache.clear()
+        generation = current
+        generation_checked = time.time()
+    return current
+
+
+def bump_generation():
+    # a timestamp keeps the counter increasing without a read before write
+    s3.put_object(
+        Bucket=ENV_ATHENA.ATHENA_METADATA_BUCKET,
+        Key=GENERATION_KEY,
+        Body=str(time.time_ns()).encode(),
+    )
+
+
+def normalise(query):
+    parts = literals.split(query.strip())
+    parts[::2] = [re.sub(r"\s+", " ", part) for part in parts[::2]]
+
+    return "".join(parts)
+
+
+def cache_key(query, **kwargs):
+    """
+    Key of an athena query from its normalised text, the other arguments
+    of the call and the current index generation.
+    """
+    key = json.dumps(
+        [normalise(query), kwargs, get_generation()], sort_keys=True, default=str
+    )
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def record(tier):
+    with lock:
+        stats[tier] += 1
+        lookups = sum(stats.values())
+        hit_rate = (stats["local"] + stats["shared"]) / lookups
+
+    # embedded metric format, cloudwatch turns these log lines into metrics
+    print(
+        json.dumps(
+            {
+                "_aws": {
+                    "Timestamp": int(time.time() * 1000),
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": METRICS_NAMESPACE,
+                            "Dimensions": [["Tier"]],
+                            "Metrics": [{"Name": "AthenaCacheLookups"}],
+                        }
+                    ],
+                },
+                "Tier": tier,
+                "AthenaCacheLookups": 1,
+                "ContainerHitRate": round(hit_rate, 3),
+            }
+        )
+    )
+
+
+def get_cached(key):
+    with lock:
+        if key in local_cache:
+            value, stored = local_cache[key]
+
+            if time.time() - stored < CACHE_TTL:
+                local_cache.move_to_end(key)
+                record_tier = "local"
+            else:
+                del local_cache[key]
+                value = None
+        else:
+            value = None
+    if value is not None:
+        record(record_tier)
+        return value
+
+    try:
+        response = s3.get_object(
+            Bucket=ENV_ATHENA.ATHENA_METADATA_BUCKET, Key=f"{CACHE_PREFIX}{key}.json"
+        )
+        if time.time() - response["LastModified"].timestamp() < CACHE_TTL:
+            value = json.loads(response["Body"].read())
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "NoSuchKey":
+            print("Unable to read cached athena results\n", e)
+
+    if value is None:
+        record("miss")
+        return None
+    put_local(key, value)
+    record("shared")
+    return value
+
+
+def put_local(key, value):
+    with lock:
+        local_cache[key] = (value, time.time())
+        local_cache.move_to_end(key)
+
+        while len(local_cache) > LOCAL_CACHE_SIZE:
+            local_cache.popitem(last=False)
+
+
+def put_cached(key, value):
+    put_local(key, value)
+
+    try:
+        s3.put_object(
+            Bucket=ENV_ATHENA.ATHENA_METADATA_BUCKET,
+            Key=f"{CACHE_PREFIX}{key}.json",
+            Body=json.dumps(value).encode(),
+        )
+    except ClientError as e:
+        print("Unable to cache athena results\n", e)
+
+
+if __name__ == "__main__":
+    pass
@@ -1,3 +1,17 @@
 from .datasets import Dataset, VcfChromosomeMap
 from .ontologies import Anscestors, Descendants, Ontology
-from .variant_queries import VariantQuery, VariantResponse, VariantResponseIndex, S3Location
+from .variant_queries import (
+    VariantQuery,
+    VariantResponse,
+    VariantResponseIndex,
+    S3Location,
+    QueryCancellation,
+    cancel_query,
+    put_response_page,
+    iter_response_pages,
+    save_query_results,
+    get_query_results,
+    get_job_status,
+    JobStatus,
+)
+from .concurrency_budget import ConcurrencyBudget, LeasedBudget
@@ -0,0 +1,111 @@
+import math
+import time
+
+import boto3
+from pynamodb.models import Model
+from pynamodb.attributes import UnicodeAttribute, NumberAttribute, MapAttribute
+from pynamodb.exceptions import PutError, UpdateError
+
+from shared.utils import ENV_DYNAMO
+
+
+SESSION = boto3.session.Session()
+REGION = SESSION.region_name
+# attempts at a conditional update before giving up on a round
+MAX_ATTEMPTS = 5
+
+
+class ConcurrencyBudget(Model):
+    class Meta:
+        table_name = ENV_DYNAMO.DYNAMO_CONCURRENCY_BUDGETS_TABLE
+        region = REGION
+
+    id = UnicodeAttribute(hash_key=True)
+    # lease id -> {"held": slots, "expires": epoch seconds}
+    leases = MapAttribute(default=dict)
+    version = NumberAttribute(null=True)
+
+
+class LeasedBudget:
+    """
+    At most capacity slots held at once, kept in the budgets table. Slots
+    are taken and handed back under a lease, which is renewed whenever its
+    holder updates it. Slots of a lease not renewed for lease_seconds are
+    reclaimed, so only callers that died lose them to expiry. Updates are
+    conditional on the version of the item, so concurrent lambdas never
+    hand out a slot twice.
+    """
+
+    def __init__(self, budget_id, capacity, lease_seconds):
+        self.budget_id = budget_id
+        self.capacity = capacity
+        self.lease_seconds = lease_seconds
+
+    def _current(self):
+        try:
+            item = ConcurrencyBudget.get(self.budget_id, consistent_read=True)
+        except ConcurrencyBudget.DoesNotExist:
+            item = ConcurrencyBudget(self.budget_id)
+        now = time.time()
+        leases = {
+            lease: dict(entry)
+            for lease, entry in (item.leases or {}).items()
+            if entry["expires"] > now
+        }
+        return item, leases, now
+
+    def _swap(self, item, leases):
+        try:
+            if item.version:
+                item.update(
+                    actions=[
+                        ConcurrencyBudget.leases.set(leases),
+                        ConcurrencyBudget.version.set(item.version + 1),
+                    ],
+                    condition=ConcurrencyBudget.version == item.version,
+                )
+            else:
+                item.leases = leases
+                item.version = 1
+                item.save(condition=ConcurrencyBudget.version.does_not_exist())
+            return True
+        except (PutError, UpdateError) as e:
+            if e.cause_response_code == "ConditionalCheckFailedException":
+                return False
+            raise e
+
+    def _change(self, lease, change):
+        # returns the change made to the slots of lease, maybe less than asked
+        for _ in range(MAX_ATTEMPTS):
+            item, leases, now = self._current()
+            held = leases.get(lease, {"held": 0})["held"]
+
+            if change > 0:
+                in_use = sum(entry["held"] for entry in leases.values())
+                applied = min(change, math.floor(self.capacity - in_use))
+            else:
+                applied = max(change, -held)
+
+            if applied == 0:
+                return 0
+            if held + applied > 0:
+                leases[lease] = {
+                    "held": held + applied,
+                    "expires": now + self.lease_seconds,
+                }
+            else:
+                leases.pop(lease, None)
+            if self._swap(item, leases):
+                return applied
+        return 0
+
+    def acquire(self, lease, wanted):
+        # returns how many of the wanted slots were taken, maybe none
+        return max(self._change(lease, wanted), 0)
+
+    def release(self, lease, count):
+        self._change(lease, -count)
+
+
+if __name__ == "__main__":
+    pass
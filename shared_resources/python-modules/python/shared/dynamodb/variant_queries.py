@@ -1,5 +1,7 @@
 from datetime import datetime, timezone, timedelta
 from enum import Enum
+import json
+import time
 
 import boto3
 from pynamodb.models import Model
@@ -18,6 +20,12 @@ from shared.utils import ENV_DYNAMO
 
 SESSION = boto3.session.Session()
 REGION = SESSION.region_name
+# pages larger than this go to s3, dynamodb items are limited to 400 kb
+MAX_INLINE_PAGE_SIZE = 350 * 1024
+RESPONSE_POLL_DELAYS = [0.1, 0.2, 0.3, 0.5]
+
+
+s3 = boto3.client("s3")
 
 
 def get_current_time_utc():
@@ -44,12 +52,16 @@ class VariantQuery(Model):
     elapsedTime = NumberAttribute(default_for_new=-1)
     timeToExist = TTLAttribute(default_for_new=timedelta(minutes=5))
     complete = BooleanAttribute(default_for_new=False)
+    cancelled = BooleanAttribute(default_for_new=False)
 
-    # atomically increment
+    # atomically increment, ADD also creates the item of a new query
     def getResponseNumber(self):
         self.update(
             actions=[
-                VariantQuery.responsesCounter.set(VariantQuery.responsesCounter + 1),
+                VariantQuery.responsesCounter.add(1),
+                VariantQuery.timeToExist.set(
+                    VariantQuery.timeToExist | timedelta(minutes=5)
+                ),
             ]
         )
         return self.responsesCounter
@@ -65,6 +77,49 @@ class VariantQuery(Model):
         )
 
 
+# tells every worker of a query that its answer is already known
+def cancel_query(query_id):
+    VariantQuery(query_id).update(
+        actions=[
+            VariantQuery.cancelled.set(True),
+            VariantQuery.timeToExist.set(timedelta(minutes=5)),
+        ]
+    )
+
+
+class QueryCancellation:
+    """
+    Polls the cancellation flag of a query at most once per interval,
+    so workers can check it between records without a read per check.
+    """
+
+    def __init__(self, query_id, interval=0.5):
+        self.query_id = query_id
+        self.interval = interval
+        self.last_check = 0
+        self.cancelled = False
+
+    def is_cancelled(self):
+        if self.cancelled or time.time() - self.last_check < self.interval:
+            return self.cancelled
+
+        self.last_check = time.time()
+        try:
+            item = VariantQuery.get(self.query_id, attributes_to_get=["cancelled"])
+            self.cancelled = bool(item.cancelled)
+        except VariantQuery.DoesNotExist:
+            pass
+
+        if self.cancelled:
+            print(f"Query {self.query_id} was cancelled")
+        return self.cancelled
+
+    def cancel(self):
+        if not self.cancelled:
+            self.cancelled = True
+            cancel_query(self.query_id)
+
+
 class VariantResponseIndex(LocalSecondaryIndex):
     class Meta:
         index_name = "responseNumber_index"
@@ -88,8 +143,88 @@ class VariantResponse(Model):
     variantResponseIndex = VariantResponseIndex()
     checkS3 = BooleanAttribute()
     result = UnicodeAttribute(null=True)
+    payloadIndex = NumberAttribute(null=True)
     timeToExist = TTLAttribute(default_for_new=timedelta(hours=24))
 
+    def getResult(self):
+        if self.checkS3:
+            obj = s3.get_object(
+                Bucket=self.responseLocation.bucket, Key=self.responseLocation.key
+            )
+            return json.loads(obj["Body"].read())
+        return json.loads(self.result)
+
+
+# a page holds the results of one performQuery payload of a query,
+# written as soon as that payload is answered
+def put_response_page(query_id, payload_index, results, bucket, ttl=None):
+    number = VariantQuery(query_id).getResponseNumber()
+    page = json.dumps(results)
+    response = VariantResponse(
+        id=query_id,
+        responseNumber=number,
+        payloadIndex=payload_index,
+        checkS3=False,
+    )
+
+    if len(page) > MAX_INLINE_PAGE_SIZE:
+        key = f"variant-queries/{query_id}/{number}.json"
+        s3.put_object(Bucket=bucket, Key=key, Body=page.encode())
+        response.responseLocation = S3Location(bucket=bucket, key=key)
+        response.checkS3 = True
+    else:
+        response.result = page
+    if ttl is not None:
+        response.timeToExist = ttl
+    response.save()
+
+
+def iter_response_pages(query_id, expected, timeout, check=None):
+    """
+    Yields (payload index, results) of the pages of a query as they are
+    written, until all expected payloads are answered. Response numbers are
+    handed out before pages are written, so a page may show up after a
+    later one. Reading restarts from the lowest number not seen yet.
+    Pages of retried invocations repeat a payload index and are skipped.
+    """
+    deadline = time.time() + timeout
+    seen_numbers = set()
+    seen_payloads = set()
+    next_number = 1
+    polls = 0
+
+    while len(seen_payloads) < expected:
+        found = False
+
+        for page in VariantResponse.variantResponseIndex.query(
+            query_id,
+            VariantResponse.responseNumber >= next_number,
+            consistent_read=True,
+        ):
+            if page.responseNumber in seen_numbers:
+                continue
+            seen_numbers.add(page.responseNumber)
+            found = True
+
+            if page.payloadIndex in seen_payloads:
+                continue
+            seen_payloads.add(page.payloadIndex)
+            yield page.payloadIndex, page.getResult()
+
+        while next_number in seen_numbers:
+            next_number += 1
+
+        if len(seen_payloads) >= expected:
+            break
+        if check is not None:
+            check()
+        if time.time() > deadline:
+            raise TimeoutError(
+                f"Query {query_id} received {len(seen_payloads)} of {expected} responses"
+            )
+        polls = 0 if found else polls + 1
+        time.sleep(RESPONSE_POLL_DELAYS[min(polls, len(RESPONSE_POLL_DELAYS) - 1)])
+
 
 class JobStatus(Enum):
     COMPLETED = 1
@@ -98,15 +233,40 @@ class JobStatus(Enum):
 
 
 def get_job_status(query_id):
-    # TODO implement caching
-    # try:
-    #     item = VariantQuery.get(query_id)
-    #     if item.complete:
-    #         return JobStatus.COMPLETED
-    #     else:
-    #         return JobStatus.RUNNING
-    # except VariantQuery.DoesNotExist:
-    return JobStatus.NEW
+    try:
+        item = VariantQuery.get(
+            query_id, attributes_to_get=["complete", "timeToExist"]
+        )
+        # dynamodb removes expired items only eventually
+        if item.timeToExist and item.timeToExist < get_current_time_utc():
+            return JobStatus.NEW
+        if item.complete:
+            return JobStatus.COMPLETED
+        else:
+            return JobStatus.RUNNING
+    except VariantQuery.DoesNotExist:
+        return JobStatus.NEW
+
+
+# keeps the results of a finished query for later identical queries
+def save_query_results(query_id, results, bucket, ttl):
+    put_response_page(query_id, 0, results, bucket, ttl)
+    VariantQuery(query_id).update(
+        actions=[
+            VariantQuery.complete.set(True),
+            VariantQuery.endTime.set(get_current_time_utc()),
+            VariantQuery.timeToExist.set(ttl),
+        ]
+    )
+
+
+def get_query_results(query_id):
+    pages = VariantResponse.variantResponseIndex.query(
+        query_id, scan_index_forward=False, limit=1
+    )
+    for page in pages:
+        return page.getResult()
+    return None
 
 
 if __name__ == "__main__":
@@ -0,0 +1,14 @@
+from .decoding import (
+    decode_genotype_string,
+    decode_genotype_tuples,
+    parse_info,
+    MISSING,
+    PADDING,
+)
+from .sidecar import (
+    SidecarHeader,
+    SidecarWriter,
+    ROW_DTYPE,
+    sidecar_key,
+    window_of,
+)
@@ -0,0 +1,100 @@
+import re
+
+import numpy as np
+
+
+# genotype matrices are of shape (n_samples, ploidy) holding allele indexes
+# missing calls (.) are MISSING and alleles absent due to lower ploidy are PADDING
+MISSING = -1
+PADDING = -2
+allele_separator = re.compile("[|/]")
+_ZERO = ord("0")
+_DOT = ord(".")
+_PHASED = ord("|")
+_UNPHASED = ord("/")
+_COMMA = ord(",")
+
+
+def decode_genotype_string(genotypes: str) -> np.ndarray:
+    """
+    Decodes bcftools [%GT,] output, eg: 0|0,0|1,./.,
+    Single digit alleles with a uniform ploidy are decoded without any
+    per sample python work, everything else takes the slower generic path.
+    """
+    data = np.frombuffer(genotypes.encode("ascii"), dtype=np.uint8)
+    n_samples = int(np.count_nonzero(data == _COMMA))
+
+    if n_samples == 0:
+        return np.empty((0, 1), dtype=np.int32)
+
+    width = len(data) // n_samples
+
+    if len(data) == width * n_samples and width % 2 == 0:
+        grid = data.reshape(n_samples, width)
+        alleles = grid[:, 0::2]
+        separators = grid[:, 1::2]
+        is_digit = (alleles >= _ZERO) & (alleles <= _ZERO + 9)
+        is_missing = alleles == _DOT
+
+        if (
+            np.all(is_digit | is_missing)
+            and np.all(separators[:, -1] == _COMMA)
+            and np.all(
+                (separators[:, :-1] == _PHASED) | (separators[:, :-1] == _UNPHASED)
+            )
+        ):
+            matrix = alleles.astype(np.int32) - _ZERO
+            matrix[is_missing] = MISSING
+            return matrix
+
+    return _decode_generic(genotypes.rstrip(",").split(","))
+
+
+def _decode_generic(samples):
+    alleles = [allele_separator.split(gt) for gt in samples]
+    ploidy = max(len(gt) for gt in alleles)
+    matrix = np.full((len(alleles), ploidy), PADDING, dtype=np.int32)
+
+    for i, gt in enumerate(alleles):
+        matrix[i, : len(gt)] = [int(a) if a.isdigit() else MISSING for a in gt]
+
+    return matrix
+
+
+def decode_genotype_tuples(genotypes) -> np.ndarray:
+    """
+    Decodes htslib GT tuples, eg: [(0, 0), (0, 1), (None, None)]
+    """
+    genotypes = list(genotypes)
+
+    if not genotypes:
+        return np.empty((0, 1), dtype=np.int32)
+
+    ploidy = max(max(len(gt) for gt in genotypes), 1)
+    matrix = np.full((len(genotypes), ploidy), PADDING, dtype=np.int32)
+
+    for i, gt in enumerate(genotypes):
+        matrix[i, : len(gt)] = [MISSING if a is None else a for a in gt]
+
+    return matrix
+
+
+def parse_info(info):
+    """
+    Extracts AC, AN and VT from a bcftools %INFO string. Note we cannot
+    request them explicitly in the query, as bcftools will crash if they
+    aren't present.
+    """
+    alt_counts = None
+    total_count = None
+    variant_type = "N/A"
+
+    for field in info.split(";"):
+        if field.startswith("AC="):
+            alt_counts = [int(c) for c in field[3:].split(",")]
+        elif field.startswith("AN="):
+            total_count = int(field[3:])
+        elif field.startswith("VT="):
+            variant_type = field[3:]
+
+    return alt_counts, total_count, variant_type
@@ -0,0 +1,221 @@
+"""
+Bit-packed genotype sidecar files
+
+A sidecar holds, for every (record, alternate allele) pair of a VCF, a row of
+n_samples bits marking the samples carrying that allele. Rows are sorted as in
+the VCF and grouped into 16 kb windows, the same granularity as the tabix
+linear index and the default CSI min_shift, so a region maps to one contiguous
+slice of rows.
+
+Layout (little endian, numeric sections are 8 byte aligned so the file can be
+memory mapped as is)
+
+    preamble   magic, version, header length
+    header     JSON with samples, window directory and section sizes
+    rows       ROW_DTYPE array, one entry per (record, alt)
+    bits       n_rows x row_bytes packed sample bits (bit i = sample i)
+    text       "REF\\tALT\\tVT" strings referenced by the rows
+"""
+import json
+import os
+import shutil
+import struct
+import tempfile
+
+import numpy as np
+
+
+MAGIC = b"SBGT"
+VERSION = 1
+WINDOW_SHIFT = 14
+PREAMBLE = struct.Struct("<4sIQ")
+ROW_DTYPE = np.dtype(
+    [
+        ("record", "<u4"),
+        ("pos", "<i4"),
+        ("ac", "<u4"),
+        ("an", "<u4"),
+        ("text_offset", "<u8"),
+        ("text_length", "<u4"),
+        ("padding", "<u4"),
+    ]
+)
+SIDECAR_PREFIX = "genotype-sidecars"
+
+
+def sidecar_key(vcf_location):
+    # s3://bucket/path/file.vcf.gz -> genotype-sidecars/bucket/path/file.vcf.gz.sbgt
+    return f"{SIDECAR_PREFIX}/{vcf_location.split('://', 1)[-1]}.sbgt"
+
+
+def window_of(pos):
+    return (pos - 1) >> WINDOW_SHIFT
+
+
+def _aligned(size):
+    return (size + 7) & ~7
+
+
+class SidecarHeader:
+    def __init__(self, header, data_offset):
+        self.samples = header["samples"]
+        self.row_bytes = header["row_bytes"]
+        self.n_rows = header["n_rows"]
+        self.vcf_location = header["vcf_location"]
+        self.vcf_etag = header["vcf_etag"]
+        # contig -> sorted [[window, first_row, n_rows], ...]
+        self.windows = header["windows"]
+        self.rows_offset = data_offset
+        self.bits_offset = self.rows_offset + self.n_rows * ROW_DTYPE.itemsize
+        self.text_offset = self.bits_offset + self.n_rows * self.row_bytes
+
+    @classmethod
+    def header_length(cls, preamble):
+        magic, version, header_length = PREAMBLE.unpack(preamble[: PREAMBLE.size])
+        assert magic == MAGIC, "Not a genotype sidecar"
+        assert version == VERSION, f"Unsupported sidecar version {version}"
+        return header_length
+
+    @classmethod
+    def parse(cls, data):
+        header_length = cls.header_length(data)
+        header = json.loads(data[PREAMBLE.size : PREAMBLE.size + header_length])
+        return cls(header, _aligned(PREAMBLE.size + header_length))
+
+    # read_range(start, end) returns the bytes [start, end) of the sidecar
+    @classmethod
+    def load(cls, read_range, initial_size=64 * 1024):
+        data = read_range(0, initial_size)
+        header_length = cls.header_length(data)
+
+        if len(data) < PREAMBLE.size + header_length:
+            data = read_range(0, PREAMBLE.size + header_length)
+        return cls.parse(data)
+
+    # [first_row, last_row) of the rows with a position in [start, end]
+    def row_range(self, contig, start, end):
+        windows = self.windows.get(contig, [])
+        first_window, last_window = window_of(start), window_of(end)
+        selected = [w for w in windows if first_window <= w[0] <= last_window]
+
+        if not selected:
+            return 0, 0
+        return selected[0][1], selected[-1][1] + selected[-1][2]
+
+    def rows_range(self, first_row, last_row):
+        return (
+            self.rows_offset + first_row * ROW_DTYPE.itemsize,
+            self.rows_offset + last_row * ROW_DTYPE.itemsize,
+        )
+
+    def bits_range(self, first_row, last_row):
+        return (
+            self.bits_offset + first_row * self.row_bytes,
+            self.bits_offset + last_row * self.row_bytes,
+        )
+
+    def text_range(self, rows):
+        if len(rows) == 0:
+            return self.text_offset, self.text_offset
+        return (
+            self.text_offset + int(rows["text_offset"][0]),
+            self.text_offset
+            + int(rows["text_offset"][-1])
+            + int(rows["text_length"][-1]),
+        )
+
+
+class SidecarWriter:
+    """
+    Builds a sidecar file locally, records must be added in VCF order.
+    Sections are spooled to temporary files so large cohorts do not
+    need to fit in memory.
+    """
+
+    def __init__(self, path, samples, vcf_location, vcf_etag):
+        self.path = path
+        self.samples = list(samples)
+        self.vcf_location = vcf_location
+        self.vcf_etag = vcf_etag
+        self.row_bytes = (len(self.samples) + 7) // 8
+        self.n_rows = 0
+        self.n_records = 0
+        self.text_size = 0
+        self.windows = {}
+        self.workdir = tempfile.mkdtemp(dir=os.path.dirname(path) or None)
+        self.rows_file = open(os.path.join(self.workdir, "rows"), "wb")
+        self.bits_file = open(os.path.join(self.workdir, "bits"), "wb")
+        self.text_file = open(os.path.join(self.workdir, "text"), "wb")
+
+    def add_record(
+        self, contig, pos, ref, alts, variant_type, genotypes, alt_counts, total_count
+    ):
+        """
+        genotypes is the (n_samples, ploidy) matrix of allele indexes,
+        counts fall back to the genotypes when INFO/AC or INFO/AN are absent
+        """
+        if total_count is None:
+            total_count = int(np.count_nonzero(genotypes >= 0))
+
+        rows = np.zeros(len(alts), dtype=ROW_DTYPE)
+
+        for i, alt in enumerate(alts):
+            carriers = genotypes == i + 1
+            text = f"{ref}\t{alt}\t{variant_type}".encode()
+            rows[i] = (
+                self.n_records,
+                pos,
+                alt_counts[i]
+                if alt_counts is not None
+                else int(np.count_nonzero(carriers)),
+                total_count,
+                self.text_size,
+                len(text),
+                0,
+            )
+            self.bits_file.write(
+                np.packbits(carriers.any(axis=1), bitorder="little").tobytes()
+            )
+            self.text_file.write(text)
+            self.text_size += len(text)
+
+        self.rows_file.write(rows.tobytes())
+        self._add_to_window(contig, window_of(pos), len(alts))
+        self.n_rows += len(alts)
+        self.n_records += 1
+
+    def _add_to_window(self, contig, window, n_rows):
+        windows = self.windows.setdefault(contig, [])
+
+        if windows and windows[-1][0] == window:
+            windows[-1][2] += n_rows
+        else:
+            windows.append([window, self.n_rows, n_rows])
+
+    def close(self):
+        for f in (self.rows_file, self.bits_file, self.text_file):
+            f.close()
+
+        header = json.dumps(
+            {
+                "samples": self.samples,
+                "row_bytes": self.row_bytes,
+                "n_rows": self.n_rows,
+                "vcf_location": self.vcf_location,
+                "vcf_etag": self.vcf_etag,
+                "windows": self.windows,
+            }
+        ).encode()
+        preamble = PREAMBLE.pack(MAGIC, VERSION, len(header))
+        padding = _aligned(len(preamble) + len(header)) - len(preamble) - len(header)
+
+        with open(self.path, "wb") as out:
+            out.write(preamble)
+            out.write(header)
+            out.write(b"\0" * padding)
+            for section in ("rows", "bits", "text"):
+                with open(os.path.join(self.workdir, section), "rb") as f:
+                    shutil.copyfileobj(f, out)
+        shutil.rmtree(self.workdir)
+
+        return self.path
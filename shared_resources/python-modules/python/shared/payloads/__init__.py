@@ -1,2 +1,14 @@
-from .lambda_payloads import PerformQueryPayload, SplitQueryPayload
+from .lambda_payloads import (
+    PerformQueryPayload,
+    SplitQueryPayload,
+    pack_payloads,
+    unpack_payloads,
+)
 from .lambda_responses import PerformQueryResponse, SplitQueryResponse
+from .variant_columns import VariantColumns
+from .sample_lists import (
+    put_sample_list,
+    get_sample_list,
+    payload_samples,
+    INLINE_SAMPLES_LIMIT,
+)
@@ -1,3 +1,5 @@
+import json
+
 import jsons
 
 
@@ -78,3 +80,74 @@ class PerformQueryPayload(jsons.JsonSerializable):
         self.variant_min_length = variant_min_length
         self.variant_max_length = variant_max_length
         self.vcf_location = vcf_location
+
+
+# fields of a performQuery payload that vary within a fan out,
+# the rest is sent once as the template
+TASK_FIELDS = ("dataset_id", "vcf_location", "samples", "regions")
+
+
+def pack_payloads(payloads):
+    """
+    Compact form of the performQuery payloads sent to splitQuery. Shared
+    fields go in a template and datasets, vcfs and sample lists are sent
+    once each. Every payload is then a task of
+    [dataset, vcf, samples, regions] indices, with the fields that differ
+    from the template appended when there are any.
+    """
+    template = {}
+
+    if payloads:
+        template = {
+            field: value
+            for field, value in payloads[0].items()
+            if field not in TASK_FIELDS
+            and all(field in p and p[field] == value for p in payloads)
+        }
+
+    tables = {"datasets": [], "vcfs": [], "samples": []}
+    codes = {name: {} for name in tables}
+    tasks = []
+
+    def code(name, value):
+        key = json.dumps(value, sort_keys=True)
+        if key not in codes[name]:
+            codes[name][key] = len(tables[name])
+            tables[name].append(value)
+        return codes[name][key]
+
+    for payload in payloads:
+        task = [
+            code("datasets", payload["dataset_id"]),
+            code("vcfs", payload["vcf_location"]),
+            code("samples", payload.get("samples", [])),
+            payload["regions"],
+        ]
+        extra = {
+            field: value
+            for field, value in payload.items()
+            if field not in TASK_FIELDS and field not in template
+        }
+        if extra:
+            task.append(extra)
+        tasks.append(task)
+
+    return {"template": template, **tables, "tasks": tasks}
+
+
+def unpack_payloads(packed):
+    payloads = []
+
+    for dataset, vcf, samples, regions, *extra in packed["tasks"]:
+        payload = {
+            **packed["template"],
+            "dataset_id": packed["datasets"][dataset],
+            "vcf_location": packed["vcfs"][vcf],
+            "samples": packed["samples"][samples],
+            "regions": regions,
+        }
+        if extra:
+            payload.update(extra[0])
+        payloads.append(payload)
+
+    return payloads
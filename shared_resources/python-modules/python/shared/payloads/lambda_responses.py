@@ -1,7 +1,10 @@
 from dataclasses import dataclass
+from typing import Union
 
 import jsons
 
+from .variant_columns import VariantColumns
+
 
 # TODO Add comments explaining the variables
 # response sent by SplitQuery lambda
@@ -16,6 +19,12 @@ class PerformQueryResponse(jsons.JsonSerializable):
     dataset_id: str
     exists: bool
     all_alleles_count: int
-    variants: list
+    # columnar variants, see VariantColumns
+    variants: Union[dict, list]
     call_count: int
     sample_names: list
+    # region of the vcf this result covers
+    region: str = None
+
+    def __post_init__(self):
+        self.variants = VariantColumns.load(self.variants)
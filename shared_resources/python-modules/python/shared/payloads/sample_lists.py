@@ -0,0 +1,57 @@
+from functools import lru_cache
+import hashlib
+import json
+import time
+
+import boto3
+
+
+# longer sample lists are sent by reference instead of inline
+INLINE_SAMPLES_LIMIT = 200
+SAMPLE_LISTS_PREFIX = "sample-lists/"
+# uploads are repeated after this long, well before the objects expire
+REUPLOAD_AFTER = 24 * 60 * 60
+
+
+s3 = boto3.client("s3")
+# digest -> time of upload by this container
+uploaded = {}
+
+
+def put_sample_list(samples, bucket):
+    """
+    Writes a sample list to s3 under its content digest and returns its
+    location. The same list is written once however many payloads and
+    queries refer to it.
+    """
+    body = json.dumps(sorted(samples), separators=(",", ":")).encode()
+    digest = hashlib.sha256(body).hexdigest()
+    key = f"{SAMPLE_LISTS_PREFIX}{digest}.json"
+
+    if time.time() - uploaded.get(digest, 0) > REUPLOAD_AFTER:
+        s3.put_object(Bucket=bucket, Key=key, Body=body)
+        uploaded[digest] = time.time()
+
+    return f"s3://{bucket}/{key}"
+
+
+# content addressed lists never change, warm containers keep recent ones
+@lru_cache(maxsize=32)
+def get_sample_list(location):
+    bucket, key = location[5:].split("/", 1)
+    body = s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+
+    return json.loads(body)
+
+
+# samples of a payload are a list or {"location": ...} of an offloaded one
+def payload_samples(payload):
+    samples = payload.get("samples", [])
+
+    if isinstance(samples, dict):
+        return get_sample_list(samples["location"])
+    return samples
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,103 @@
+import base64
+import json
+import zlib
+
+
+# above this many variants the columns travel as a compressed blob
+COMPRESS_THRESHOLD = 256
+
+
+class VariantColumns:
+    """
+    Columnar form of the variants found by performQuery. Chromosomes and
+    variant types repeat a lot, so they are dictionary encoded, positions
+    are kept as integers. Iterating yields (chrom, pos, ref, alt, type).
+    """
+
+    def __init__(self):
+        self.chroms = []
+        self.types = []
+        self.chrom = []
+        self.pos = []
+        self.ref = []
+        self.alt = []
+        self.type = []
+        self._chrom_codes = {}
+        self._type_codes = {}
+
+    def append(self, chrom, pos, ref, alt, typ):
+        if chrom not in self._chrom_codes:
+            self._chrom_codes[chrom] = len(self.chroms)
+            self.chroms.append(chrom)
+        if typ not in self._type_codes:
+            self._type_codes[typ] = len(self.types)
+            self.types.append(typ)
+
+        self.chrom.append(self._chrom_codes[chrom])
+        self.pos.append(int(pos))
+        self.ref.append(ref)
+        self.alt.append(alt)
+        self.type.append(self._type_codes[typ])
+
+    def extend(self, other):
+        for variant in other:
+            self.append(*variant)
+
+    def __len__(self):
+        return len(self.pos)
+
+    def __iter__(self):
+        chroms = self.chroms
+        types = self.types
+
+        for chrom, pos, ref, alt, typ in zip(
+            self.chrom, self.pos, self.ref, self.alt, self.type
+        ):
+            yield chroms[chrom], pos, ref, alt, types[typ]
+
+    def columns(self):
+        return {
+            "chroms": self.chroms,
+            "types": self.types,
+            "chrom": self.chrom,
+            "pos": self.pos,
+            "ref": self.ref,
+            "alt": self.alt,
+            "type": self.type,
+        }
+
+    def dump(self):
+        columns = self.columns()
+
+        if len(self) < COMPRESS_THRESHOLD:
+            return columns
+        blob = zlib.compress(json.dumps(columns, separators=(",", ":")).encode())
+        return {"blob": base64.b64encode(blob).decode()}
+
+    @classmethod
+    def load(cls, data):
+        if isinstance(data, cls):
+            return data
+
+        variants = cls()
+
+        # tab separated strings, as sent by older performQuery versions
+        if isinstance(data, list):
+            for variant in data:
+                variants.append(*variant.split("\t"))
+            return variants
+
+        if "blob" in data:
+            data = json.loads(zlib.decompress(base64.b64decode(data["blob"])))
+
+        variants.chroms = data["chroms"]
+        variants.types = data["types"]
+        variants.chrom = data["chrom"]
+        variants.pos = data["pos"]
+        variants.ref = data["ref"]
+        variants.alt = data["alt"]
+        variants.type = data["type"]
+        variants._chrom_codes = {c: n for n, c in enumerate(variants.chroms)}
+        variants._type_codes = {t: n for n, t in enumerate(variants.types)}
+
+        return variants
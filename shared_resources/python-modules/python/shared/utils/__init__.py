@@ -9,3 +9,5 @@ from .lambda_utils import (
     clear_tmp,
 )
 from .lambda_utils import LambdaClient
+from .async_lambda import AsyncLambdaClient, LambdaFanOut
+from .hedging import HedgePolicy
@@ -0,0 +1,212 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import asyncio
+import json
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from .lambda_utils import LambdaClient
+
+
+# blocking boto3 calls of every fan out in the container share these threads
+EXECUTOR_THREADS = 200
+RETRY_CODES = ("TooManyRequestsException", "ServiceException")
+MAX_ATTEMPTS = 10
+BACKOFF_BASE = 0.05
+BACKOFF_CAP = 2.0
+
+
+_loop = None
+_client = None
+_loop_lock = threading.Lock()
+
+
+def failed(future):
+    # lambdas that raise answer with an error payload instead of failing
+    if future.exception() is not None:
+        return True
+    payload = future.result()
+    return isinstance(payload, dict) and "errorMessage" in payload
+
+
+def get_loop():
+    # one event loop thread per container, started on first use and
+    # reused by the requests a warm container serves
+    global _loop
+
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            loop.set_default_executor(ThreadPoolExecutor(EXECUTOR_THREADS))
+            threading.Thread(target=loop.run_forever, daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+def get_client():
+    global _client
+
+    with _loop_lock:
+        if _client is None:
+            _client = AsyncLambdaClient()
+    return _client
+
+
+class AsyncLambdaClient:
+    """
+    Invokes lambdas from asyncio code. Calls are made with the client of
+    LambdaClient on the shared executor. Throttled calls back off with
+    full jitter on the event loop, so waiting does not hold a thread.
+    """
+
+    def __init__(self):
+        self.client = LambdaClient().client
+
+    def _invoke(self, kwargs):
+        response = self.client.invoke(**kwargs)
+
+        if kwargs.get("InvocationType", "RequestResponse") == "RequestResponse":
+            response["Payload"] = json.loads(response["Payload"].read())
+        else:
+            response["Payload"] = None
+        return response
+
+    async def invoke(self, **kwargs):
+        loop = asyncio.get_running_loop()
+
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                return await loop.run_in_executor(None, self._invoke, kwargs)
+            except ClientError as error:
+                if (
+                    error.response["Error"]["Code"] not in RETRY_CODES
+                    or attempt == MAX_ATTEMPTS - 1
+                ):
+                    raise error
+            await asyncio.sleep(
+                random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt))
+            )
+
+
+class LambdaFanOut:
+    """
+    Runs lambda invocations with at most `concurrency` in flight, results
+    are read with as_completed as they arrive. Leaving the with block
+    cancels the invocations that have not started yet.
+    """
+
+    def __init__(self, concurrency):
+        self.client = get_client()
+        self.concurrency = concurrency
+        self.loop = get_loop()
+        self.semaphore = None
+        self.futures = {}
+        self.elapsed = {}
+        # key -> (skip, kwargs) of its invocation, to send it again
+        self.requests = {}
+        self.started = {}
+        self.hedged = set()
+        self.cancelled = False
+
+    async def _run(self, key, skip, kwargs):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+
+        async with self.semaphore:
+            # checked once a slot is free, eg. a cancelled query
+            if skip is not None and await self.loop.run_in_executor(None, skip):
+                return None
+
+            start = time.time()
+            self.started.setdefault(key, start)
+            response = await self.client.invoke(**kwargs)
+            # the first copy of a hedged invocation to finish is timed
+            self.elapsed.setdefault(key, time.time() - start)
+            return response["Payload"]
+
+    def submit(self, key, skip=None, **kwargs):
+        future = asyncio.run_coroutine_threadsafe(
+            self._run(key, skip, kwargs), self.loop
+        )
+        self.futures[future] = key
+        self.requests.setdefault(key, (skip, kwargs))
+        return future
+
+    def _hedge(self, hedging, answered):
+        if self.cancelled:
+            return []
+        running = {
+            key: start
+            for key, start in list(self.started.items())
+            if key not in answered and key not in self.hedged
+        }
+        hedges = []
+
+        for key in hedging.stragglers(
+            running, len(answered), len(self.requests), len(self.hedged)
+        ):
+            print(f"Hedging invocation {key}")
+            skip, kwargs = self.requests[key]
+            self.hedged.add(key)
+            hedges.append(self.submit(key, skip, **kwargs))
+        return hedges
+
+    def as_completed(self, return_exceptions=False, hedging=None):
+        """
+        Yields (key, payload) of the invocations as they finish, the payload
+        is None for skipped ones and for asynchronous invocations. With a
+        HedgePolicy, stragglers are invoked again and the first copy to
+        finish answers for its key.
+        """
+        pending = set(self.futures)
+        answered = set()
+        timeout = hedging.interval if hedging is not None else None
+
+        while pending and len(answered) < len(self.requests):
+            done, pending = wait(pending, timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                key = self.futures[future]
+
+                if future.cancelled() or key in answered:
+                    continue
+                error = future.exception()
+                # a failed copy leaves the answer to the one still running
+                if failed(future) and any(
+                    self.futures[other] == key for other in pending
+                ):
+                    continue
+                answered.add(key)
+
+                if hedging is not None and key in self.elapsed:
+                    hedging.record(self.elapsed[key])
+                if return_exceptions and error is not None:
+                    yield key, error
+                else:
+                    yield key, future.result()
+
+            if hedging is not None:
+                pending.update(self._hedge(hedging, answered))
+
+    def raise_errors(self):
+        for future in self.futures:
+            if future.done() and not future.cancelled() and future.exception():
+                raise future.exception()
+
+    def cancel(self):
+        self.cancelled = True
+
+        for future in self.futures:
+            future.cancel()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cancel()
+
+
+if __name__ == "__main__":
+    pass
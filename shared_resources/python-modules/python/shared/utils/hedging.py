@@ -0,0 +1,72 @@
+from collections import deque
+import math
+import threading
+import time
+
+
+class HedgePolicy:
+    """
+    Decides when an invocation of a fan out is slow enough to be sent
+    again. Once most of a fan out has finished, invocations running past
+    a high quantile of recent latencies get one duplicate each, up to a
+    share of the fan out that caps the extra cost.
+    """
+
+    def __init__(
+        self,
+        quantile=0.9,
+        multiplier=1.5,
+        min_delay=1.0,
+        min_finished=0.75,
+        max_hedged=0.1,
+        min_samples=5,
+        interval=0.1,
+        history=500,
+    ):
+        self.quantile = quantile
+        self.multiplier = multiplier
+        self.min_delay = min_delay
+        self.min_finished = min_finished
+        self.max_hedged = max_hedged
+        self.min_samples = min_samples
+        # seconds between straggler checks while waiting for results
+        self.interval = interval
+        # latencies are kept by warm containers across requests
+        self.latencies = deque(maxlen=history)
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.latencies.append(seconds)
+
+    def threshold(self):
+        with self.lock:
+            if len(self.latencies) < self.min_samples:
+                return None
+            latencies = sorted(self.latencies)
+
+        index = min(len(latencies) - 1, math.floor(self.quantile * len(latencies)))
+        return max(self.min_delay, self.multiplier * latencies[index])
+
+    def stragglers(self, started, finished, total, hedged):
+        """
+        Keys to send again, given the start times of the invocations
+        still running and how many of the fan out finished or were hedged.
+        """
+        if finished < self.min_finished * total:
+            return []
+        budget = max(1, math.floor(self.max_hedged * total)) - hedged
+        threshold = self.threshold()
+
+        if budget <= 0 or threshold is None:
+            return []
+        now = time.time()
+        # the longest running go first
+        slow = sorted(
+            (start, key) for key, start in started.items() if now - start > threshold
+        )
+        return [key for _, key in slow[:budget]]
+
+
+if __name__ == "__main__":
+    pass
@@ -272,6 +272,10 @@ class DynamoDBEnvironment:
     def DYNAMO_ONTO_INDEX_TABLE(self):
         return os.environ["DYNAMO_ONTO_INDEX_TABLE"]
 
+    @property
+    def DYNAMO_CONCURRENCY_BUDGETS_TABLE(self):
+        return os.environ["DYNAMO_CONCURRENCY_BUDGETS_TABLE"]
+
 
 class SnsEnvironment:
     @property
@@ -284,11 +288,34 @@ class ConfigEnvironment:
     def CONFIG_MAX_VARIANT_SEARCH_BASE_RANGE(self):
         return int(os.environ["CONFIG_MAX_VARIANT_SEARCH_BASE_RANGE"])
 
+    @property
+    def CONFIG_VARIANT_QUERY_READER(self):
+        return os.environ.get("CONFIG_VARIANT_QUERY_READER", "htslib").strip().lower()
+
+    @property
+    def CONFIG_VARIANT_QUERY_CACHE_SIZE(self):
+        return int(os.environ.get("CONFIG_VARIANT_QUERY_CACHE_SIZE", 512))
+
+    @property
+    def CONFIG_MAX_VARIANT_QUERY_CONCURRENCY(self):
+        return int(os.environ.get("CONFIG_MAX_VARIANT_QUERY_CONCURRENCY", 800))
+
+    @property
+    def CONFIG_VARIANT_QUERY_LOCAL_THRESHOLD(self):
+        return int(os.environ.get("CONFIG_VARIANT_QUERY_LOCAL_THRESHOLD", 1024))
+
+    @property
+    def CONFIG_ATHENA_COLUMNAR_RESULTS(self):
+        value = os.environ.get("CONFIG_ATHENA_COLUMNAR_RESULTS", "false")
+        return value.strip().lower() in ("true", "1")
+
 
-def clear_tmp():
+def clear_tmp(keep=()):
     try:
         for file_name in os.listdir("/tmp"):
             file_path = "/tmp/" + file_name
+            if file_path in keep:
+                continue
             if os.path.isfile(file_path):
                 os.unlink(file_path)
             elif os.path.isdir(file_path):
@@ -0,0 +1,3 @@
+from .block_cache import CACHE_DIR, localise
+from .query_engine import perform_query, parse_region
+from .readers import get_reader
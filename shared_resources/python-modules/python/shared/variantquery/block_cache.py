@@ -0,0 +1,307 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+import hashlib
+import io
+import os
+import shutil
+import threading
+
+import boto3
+from botocore.exceptions import ClientError
+
+from shared.utils import ENV_CONFIG
+from shared.vcfindex import VcfIndex, merge_ranges, MAX_BLOCK_SIZE
+
+
+CACHE_DIR = "/tmp/block-cache"
+# bgzf end of file marker, checked by htslib when opening local files
+EOF_MARKER_SIZE = 28
+INDEX_EXTENSIONS = (".tbi", ".csi")
+
+s3 = boto3.client("s3")
+
+
+def split_s3_location(location):
+    bucket, key = location[5:].split("/", 1)
+    return bucket, key
+
+
+def fetch_range(location, start, end):
+    bucket, key = split_s3_location(location)
+    response = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end - 1}")
+    return response["Body"].read()
+
+
+class CachedVcf:
+    """
+    A sparse local copy of a remote vcf. Only the compressed blocks that
+    were queried are written, next to a full copy of its index so that
+    bcftools and htslib read it as a regular indexed file. The lock is
+    held while the index, header or blocks are written.
+    """
+
+    def __init__(self, directory, vcf_location, size):
+        self.directory = directory
+        self.vcf_location = vcf_location
+        self.size = size
+        self.path = os.path.join(directory, os.path.basename(vcf_location))
+        self.ranges = []
+        self.cached_bytes = 0
+        self.index = None
+        self.lock = threading.Lock()
+        # the index and header are on disk
+        self.ready = False
+        # queries reading the local copy, its files stay until they finish
+        self.readers = 0
+        self.evicted = False
+
+        os.makedirs(directory)
+        with open(self.path, "wb") as f:
+            f.truncate(size)
+
+    def load_index(self):
+        for extension in INDEX_EXTENSIONS:
+            bucket, key = split_s3_location(self.vcf_location + extension)
+            try:
+                data = s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+            except ClientError as error:
+                if error.response["Error"]["Code"] in ("NoSuchKey", "404", "403"):
+                    continue
+                raise error
+            with open(self.path + extension, "wb") as f:
+                f.write(data)
+            self.index = VcfIndex.load(io.BytesIO(data), self.path + extension)
+            self.cached_bytes += len(data)
+            return
+        raise FileNotFoundError(f"No index found for {self.vcf_location}")
+
+    def missing(self, start, end):
+        # parts of [start, end) that are not on disk yet
+        gaps = []
+
+        for cached_start, cached_end in self.ranges:
+            if cached_end <= start or cached_start >= end:
+                continue
+            if cached_start > start:
+                gaps.append((start, cached_start))
+            start = max(start, cached_end)
+        if start < end:
+            gaps.append((start, end))
+        return gaps
+
+    def fill(self, gaps):
+        if len(gaps) > 1:
+            with ThreadPoolExecutor(min(len(gaps), 8)) as executor:
+                blocks = list(
+                    executor.map(
+                        lambda gap: fetch_range(self.vcf_location, *gap), gaps
+                    )
+                )
+        else:
+            blocks = [fetch_range(self.vcf_location, *gap) for gap in gaps]
+
+        with open(self.path, "r+b") as f:
+            for (start, _), data in zip(gaps, blocks):
+                f.seek(start)
+                f.write(data)
+                self.cached_bytes += len(data)
+        self.ranges = merge_ranges(self.ranges + gaps)
+        # htslib warns when the data file is newer than its index
+        os.utime(self.path, (0, 0))
+
+    def clip(self, ranges):
+        return [
+            (start, min(end, self.size)) for start, end in ranges if start < self.size
+        ]
+
+
+class BlockCache:
+    """
+    Size bounded cache of vcf indices and compressed blocks in /tmp,
+    keyed by S3 location and ETag and evicted least recently used first.
+    Survives between invocations of a warm container. Queries on several
+    threads share it, entries in use are never removed from disk.
+    """
+
+    def __init__(self, directory, capacity):
+        self.directory = directory
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        # guards entries, readers, evicted and the counters
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_fetched = 0
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+    @property
+    def cached_bytes(self):
+        return sum(entry.cached_bytes for entry in self.entries.values())
+
+    def entry(self, vcf_location):
+        # returns the entry of the current version of the file, pinned
+        # until it is released
+        bucket, key = split_s3_location(vcf_location)
+        head = s3.head_object(Bucket=bucket, Key=key)
+        cache_key = (vcf_location, head["ETag"])
+
+        with self.lock:
+            if cache_key in self.entries:
+                self.entries.move_to_end(cache_key)
+                entry = self.entries[cache_key]
+            else:
+                # an older version of the same file is no longer useful
+                for stale_key in [k for k in self.entries if k[0] == vcf_location]:
+                    self.evict(stale_key)
+
+                entry = CachedVcf(
+                    os.path.join(
+                        self.directory,
+                        hashlib.md5("".join(cache_key).encode()).hexdigest(),
+                    ),
+                    vcf_location,
+                    head["ContentLength"],
+                )
+                self.entries[cache_key] = entry
+            entry.readers += 1
+        return cache_key, entry
+
+    def evict(self, cache_key):
+        # called with the cache lock held
+        entry = self.entries.pop(cache_key)
+        entry.evicted = True
+
+        if entry.readers == 0:
+            shutil.rmtree(entry.directory, ignore_errors=True)
+
+    def release(self, entry):
+        with self.lock:
+            entry.readers -= 1
+
+            if entry.evicted and entry.readers == 0:
+                shutil.rmtree(entry.directory, ignore_errors=True)
+
+    def read(self, entry, ranges):
+        # called with the entry lock held
+        gaps = [
+            gap
+            for start, end in entry.clip(ranges)
+            for gap in entry.missing(start, end)
+        ]
+
+        if gaps:
+            entry.fill(gaps)
+        with self.lock:
+            if gaps:
+                self.misses += 1
+                self.bytes_fetched += sum(end - start for start, end in gaps)
+            else:
+                self.hits += 1
+
+    def prepare(self, cache_key, entry):
+        # the first query of a file writes its index and header, the
+        # others wait for them
+        with entry.lock:
+            if entry.ready:
+                return
+            try:
+                entry.load_index()
+                header_end = (
+                    entry.index.first_record_offset() >> 16
+                ) + MAX_BLOCK_SIZE
+                self.read(
+                    entry,
+                    [(0, header_end), (entry.size - EOF_MARKER_SIZE, entry.size)],
+                )
+                entry.ready = True
+            except Exception as e:
+                with self.lock:
+                    if self.entries.get(cache_key) is entry:
+                        self.evict(cache_key)
+                raise e
+
+    @contextmanager
+    def localise(self, vcf_location, regions):
+        """
+        Yields a local path holding every block needed to query regions
+        of vcf_location, or vcf_location itself when a region cannot
+        be resolved from the index. The local copy is kept until the
+        with block ends.
+        """
+        cache_key, entry = self.entry(vcf_location)
+
+        try:
+            self.prepare(cache_key, entry)
+            ranges = []
+
+            for region in regions:
+                chromosome = region[: region.find(":")]
+                beg = int(region[region.find(":") + 1 : region.find("-")]) - 1
+                end = int(region[region.find("-") + 1 :])
+                region_ranges = entry.index.byte_ranges(chromosome, beg, end)
+
+                if region_ranges is None:
+                    ranges = None
+                    break
+                ranges += region_ranges
+
+            if ranges is None:
+                path = vcf_location
+            else:
+                with entry.lock:
+                    self.read(entry, merge_ranges(ranges))
+                self.shrink()
+
+                with self.lock:
+                    stats = (
+                        f"Block cache: {self.hits} hits, {self.misses} misses, "
+                        f"{self.bytes_fetched} bytes fetched, "
+                        f"{self.cached_bytes} bytes cached"
+                    )
+                print(stats)
+                path = entry.path
+        except Exception:
+            self.release(entry)
+            raise
+        try:
+            yield path
+        finally:
+            self.release(entry)
+
+    def shrink(self):
+        # entries being read are skipped, they are evicted on a later call
+        with self.lock:
+            for cache_key in list(self.entries):
+                if self.cached_bytes <= self.capacity:
+                    break
+                if self.entries[cache_key].readers == 0:
+                    self.evict(cache_key)
+
+
+# the cache may take at most half of the ephemeral storage of the lambda,
+# which differs between performQuery and the api lambdas
+block_cache = BlockCache(
+    CACHE_DIR,
+    min(
+        ENV_CONFIG.CONFIG_VARIANT_QUERY_CACHE_SIZE * 1024 * 1024,
+        shutil.disk_usage("/tmp").total // 2,
+    ),
+)
+
+
+@contextmanager
+def localise(vcf_location, regions):
+    with ExitStack() as stack:
+        path = vcf_location
+
+        if block_cache.capacity > 0:
+            try:
+                path = stack.enter_context(block_cache.localise(vcf_location, regions))
+            except Exception as e:
+                print(
+                    f"Block cache unavailable for {vcf_location}, reading from S3\n", e
+                )
+        yield path
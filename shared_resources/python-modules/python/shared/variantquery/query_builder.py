@@ -3,14 +3,18 @@ from typing import List
 
 class QueryBuiler:
     def __init__(self) -> None:
-        self.region = ""
+        self.regions = []
         self.samples = []
         self.format = "%POS\t%REF\t%ALT\t%INFO\t[%GT,]"
         self.vcf = ""
-        self.parser_attrs = []
 
     def set_region(self, region: str):
-        self.region = region
+        self.regions = [region]
+
+        return self
+
+    def set_regions(self, regions: List[str]):
+        self.regions = regions
 
         return self
 
@@ -24,17 +28,15 @@ class QueryBuiler:
 
         return self
 
-    def set_return_samples(self, flag=True):
-        if flag:
-            self.format += "\t[%SAMPLE,]"
-        return self
-
     def build(self):
         args = [
             "bcftools",
             "query",
             "--regions",
-            self.region,
+            ",".join(self.regions),
+            # only records starting in a region, so none is reported twice
+            "--regions-overlap",
+            "pos",
             "--format",
             f"{self.format}\n",
         ]
@@ -47,11 +49,7 @@ class QueryBuiler:
             # TODO if this is the case, must be piped for correct AC/AN
             # Use bcftools view for this
         print(f"Built query: {str(args)}")
-        self.parser_attrs = len(self.format.split("\t"))
         return args
 
     def parse_line(self, line):
-        if self.parser_attrs == 5:
-            return line.split("\t") + [""]
-        elif self.parser_attrs == 6:
-            return line.split("\t")
+        return line.split("\t")
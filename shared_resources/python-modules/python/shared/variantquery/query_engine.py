@@ -0,0 +1,270 @@
+import numpy as np
+
+from shared.apiutils.requests import Granularity
+from shared.dynamodb import QueryCancellation
+from shared.payloads import VariantColumns, payload_samples
+from shared.utils import ENV_CONFIG
+from .block_cache import localise
+from .readers import get_reader
+from .sidecar_query import query_sidecar
+from .variant_matcher import build_matcher
+
+
+# uncomment below for debugging
+# os.environ['LD_DEBUG'] = 'all'
+
+
+def parse_region(region):
+    ## region is of form: "chrom:start-end"
+    first_base_pos = int(region[region.find(":") + 1 : region.find("-")])
+    last_base_pos = int(region[region.find("-") + 1 :])
+    chromosome = region[: region.find(":")]
+
+    return chromosome, first_base_pos, last_base_pos
+
+
+def fetch_records(reader, vcf_location, regions, chosen_samples, include_samples):
+    # read through the warm container block cache, the local copy is kept
+    # until every record was read
+    with localise(vcf_location, regions) as local_location:
+        yield from reader.fetch(
+            local_location, regions, chosen_samples, include_samples
+        )
+
+
+def perform_query(payload: dict(), is_async: bool = False):
+    # a payload carries either a single region or a list of
+    # regions of the same vcf, answered in one reader pass
+    batched = "regions" in payload
+    regions = sorted(
+        payload["regions"] if batched else [payload["region"]],
+        key=lambda region: parse_region(region)[1],
+    )
+    variant_type = payload.get("variant_type", "")
+    # alleles requested
+    reference_bases = payload.get("reference_bases", "N")
+    alternate_bases = payload.get("alternate_bases", "N")
+    # variant end range
+    end_min = payload["end_min"]
+    end_max = payload["end_max"]
+    # variant length
+    variant_max_length = payload.get("variant_max_length", -1)
+    variant_min_length = payload.get("variant_min_length", 0)
+
+    if variant_max_length < 0:
+        variant_max_length = float("inf")
+
+    # granularity
+    requested_granularity = payload.get("requested_granularity", Granularity.BOOLEAN)
+    # details
+    include_details = payload.get("include_details", False)
+    chosen_samples = payload_samples(payload)
+    # samples
+    include_samples = payload.get("include_samples", False)
+    # query id
+    query_id = payload.get("query_id", "-")
+    dataset_id = payload.get("dataset_id", "-")
+
+    # allele specification is compiled once per payload
+    matcher = build_matcher(
+        variant_type, alternate_bases, variant_min_length, variant_max_length
+    )
+
+    # sample level lookups are answered from the genotype sidecar when
+    # the dataset was ingested with one, without decoding the vcf
+    if requested_granularity == Granularity.RECORD and include_samples:
+        responses = []
+
+        for region in regions:
+            response = query_sidecar(
+                payload["vcf_location"],
+                *parse_region(region),
+                end_min,
+                end_max,
+                reference_bases,
+                matcher,
+                chosen_samples,
+            )
+            if response is None:
+                break
+            responses.append(
+                {
+                    "dataset_id": dataset_id,
+                    "region": region,
+                    **response,
+                    "variants": response["variants"].dump(),
+                }
+            )
+        else:
+            print("Answered from genotype sidecar")
+            return responses if batched else responses[0]
+
+    # boolean queries stop once any other worker found a hit
+    cancellation = None
+
+    if requested_granularity == Granularity.BOOLEAN:
+        cancellation = QueryCancellation(query_id)
+
+    reader = get_reader(ENV_CONFIG.CONFIG_VARIANT_QUERY_READER)
+    records = fetch_records(
+        reader, payload["vcf_location"], regions, chosen_samples, include_samples
+    )
+
+    # pipeline variables, one set per region
+    results = [
+        {
+            "region": region,
+            "exists": False,
+            "variants": VariantColumns(),
+            "call_count": 0,
+            "all_alleles_count": 0,
+            "sample_indices": set(),
+        }
+        for region in regions
+    ]
+    current = 0
+    chromosome, first_base_pos, last_base_pos = parse_region(regions[current])
+    # regions whose answer is known, their remaining records are skipped
+    finished = set()
+
+    print(f"Iterating {reader.name} result")
+    # iterate through vcf records, ordered by position as the regions are
+    for record in records:
+        if cancellation is not None and cancellation.is_cancelled():
+            break
+
+        vcf_position = record.position
+
+        # move on to the region holding this record
+        while vcf_position > last_base_pos and current < len(regions) - 1:
+            current += 1
+            chromosome, first_base_pos, last_base_pos = parse_region(
+                regions[current]
+            )
+        result = results[current]
+
+        # Ensure each variant will only be found by one process
+        # TODO handle CNVs
+        if current in finished or not first_base_pos <= vcf_position <= last_base_pos:
+            continue
+
+        vcf_reference = record.reference
+        vcf_reference_length = len(vcf_reference)
+
+        # must be within end range
+        if not end_min <= vcf_position + vcf_reference_length - 1 <= end_max:
+            continue
+
+        # validation; if not N validate
+        if vcf_reference.upper() != reference_bases and reference_bases != "N":
+            continue
+
+        vcf_all_alts = record.alts
+        hit_indexes = matcher(vcf_reference, vcf_all_alts)
+
+        if not hit_indexes:
+            continue
+        # hit_indexes are of form [0, 1] for ALT A,GC
+        alt_counts = record.alt_counts
+        total_count = record.total_count
+        vcf_variant_type = record.variant_type
+
+        genotypes = None
+        hit_alleles = [i + 1 for i in hit_indexes]
+        # if AC=X was there
+        if alt_counts is not None:
+            call_counts = [alt_counts[i] for i in hit_indexes]
+            # ("Chr1", 123, "A", "G", "SNP")
+            for i in hit_indexes:
+                if alt_counts[i] != 0:
+                    result["variants"].append(
+                        chromosome,
+                        vcf_position,
+                        vcf_reference,
+                        vcf_all_alts[i],
+                        vcf_variant_type,
+                    )
+            result["call_count"] += sum(call_counts)
+        # otherwise
+        else:
+            # Slower, but doesn't require INFO/AC
+            # all samples are counted at once on the decoded genotypes
+            genotypes = record.genotype_matrix()
+            hit_mask = np.isin(genotypes, hit_alleles)
+            # ("Chr1", 123, "A", "G", "SNP")
+            for i in np.unique(genotypes[hit_mask]).tolist():
+                result["variants"].append(
+                    chromosome,
+                    vcf_position,
+                    vcf_reference,
+                    vcf_all_alts[i - 1],
+                    vcf_variant_type,
+                )
+            result["call_count"] += int(np.count_nonzero(hit_mask))
+
+        # if there are actual variants
+        if result["call_count"]:
+            result["exists"] = True
+            # existence is all this region needs, the others still run
+            if not include_details:
+                finished.add(current)
+
+                if len(finished) == len(regions):
+                    break
+                continue
+            if requested_granularity == Granularity.RECORD and include_samples:
+                if genotypes is None:
+                    genotypes = record.genotype_matrix()
+                    hit_mask = np.isin(genotypes, hit_alleles)
+                result["sample_indices"].update(
+                    np.flatnonzero(hit_mask.any(axis=1)).tolist()
+                )
+
+        # Used for calculating frequency. This will be a misleading value if the
+        # alleles are spread over multiple vcf records. Ideally we should
+        # return a dictionary for each matching record/allele, but for now the
+        # beacon specification doesn't support it. A quick fix might be to
+        # represent the frequency of any matching allele in the population of
+        # haplotypes, but this could lead to an illegal value > 1.
+        if total_count is not None:
+            result["all_alleles_count"] += total_count
+        else:
+            # Slower, but doesn't require INFO/AN
+            if genotypes is None:
+                genotypes = record.genotype_matrix()
+            result["all_alleles_count"] += int(np.count_nonzero(genotypes >= 0))
+
+        # if only bool is asked and a variant if found
+        # every region of the payload belongs to the same dataset
+        if requested_granularity == Granularity.BOOLEAN and result["exists"]:
+            break
+    records.close()
+
+    # let the other workers of this query stop early
+    if cancellation is not None and any(result["exists"] for result in results):
+        cancellation.cancel()
+
+    print(f"Iterating {reader.name} result complete")
+
+    responses = []
+
+    for result in results:
+        sample_indices = result.pop("sample_indices")
+        sample_names = []
+
+        if requested_granularity == Granularity.RECORD and include_samples:
+            sample_names = [
+                sample
+                for n, sample in enumerate(reader.sample_names)
+                if n in sample_indices
+            ]
+        responses.append(
+            {
+                "dataset_id": dataset_id,
+                **result,
+                "variants": result["variants"].dump(),
+                "sample_names": [] if not include_samples else sample_names,
+            }
+        )
+
+    return responses if batched else responses[0]
@@ -0,0 +1,212 @@
+from abc import ABC, abstractmethod
+import os
+import subprocess
+
+from shared.genotypes import (
+    decode_genotype_string,
+    decode_genotype_tuples,
+    parse_info,
+)
+from .query_builder import QueryBuiler
+
+try:
+    import pysam
+except ImportError:
+    pysam = None
+
+
+# vcf location -> sample names in header order, for the container's lifetime
+header_samples = {}
+
+
+def get_header_samples(vcf_location):
+    if vcf_location not in header_samples:
+        args = ["bcftools", "query", "--list-samples", vcf_location]
+        output = subprocess.check_output(args, cwd="/tmp", encoding="ascii")
+        header_samples[vcf_location] = [
+            sample for sample in output.split("\n") if sample
+        ]
+    return header_samples[vcf_location]
+
+
+# a single vcf record as seen by the query engine
+# genotypes are decoded lazily as most queries only need INFO/AC and INFO/AN,
+# each reader's record decodes the genotypes it holds
+class VcfRecord(ABC):
+    __slots__ = (
+        "position",
+        "reference",
+        "alts",
+        "alt_counts",
+        "total_count",
+        "variant_type",
+        "genotypes",
+        "_genotype_matrix",
+    )
+
+    def __init__(
+        self, position, reference, alts, alt_counts, total_count, variant_type, genotypes
+    ):
+        self.position = position
+        self.reference = reference
+        self.alts = alts
+        self.alt_counts = alt_counts
+        self.total_count = total_count
+        self.variant_type = variant_type
+        self.genotypes = genotypes
+        self._genotype_matrix = None
+
+    # (n_samples, ploidy) array of allele indexes, decoded once per record
+    def genotype_matrix(self):
+        if self._genotype_matrix is None:
+            self._genotype_matrix = self.decode_genotypes()
+        return self._genotype_matrix
+
+    @abstractmethod
+    def decode_genotypes(self):
+        pass
+
+
+class BcftoolsRecord(VcfRecord):
+    __slots__ = ()
+
+    # parsing 0|0,0|0,0|0,0|0
+    def decode_genotypes(self):
+        return decode_genotype_string(self.genotypes)
+
+
+class HtslibRecord(VcfRecord):
+    __slots__ = ()
+
+    # genotypes hold the pysam samples proxy
+    def decode_genotypes(self):
+        return decode_genotype_tuples(
+            sample["GT"] for sample in self.genotypes.values()
+        )
+
+
+class BcftoolsReader:
+    """
+    Runs bcftools query in a subprocess and parses the text output.
+    Kept as the fallback reader when htslib bindings are unavailable.
+    """
+
+    name = "bcftools"
+
+    def __init__(self):
+        self.sample_names = []
+
+    # regions are read by a single bcftools process, in the given order
+    def fetch(self, vcf_location, regions, samples=[], include_samples=False):
+        bcftools_query = QueryBuiler()
+        bcftools_query = bcftools_query.set_samples(samples)
+        bcftools_query = bcftools_query.set_regions(regions)
+        bcftools_query = bcftools_query.set_vcf(vcf_location)
+        args = bcftools_query.build()
+
+        # genotype columns follow the header order of the chosen samples
+        if include_samples:
+            chosen = set(samples)
+            self.sample_names = [
+                sample
+                for sample in get_header_samples(vcf_location)
+                if not samples or sample in chosen
+            ]
+
+        query_process = subprocess.Popen(
+            args, stdout=subprocess.PIPE, cwd="/tmp", encoding="ascii"
+        )
+
+        try:
+            for line in query_process.stdout:
+                try:
+                    (
+                        vcf_position,
+                        vcf_reference,
+                        vcf_all_alts,
+                        vcf_info_str,
+                        vcf_genotypes,
+                    ) = bcftools_query.parse_line(line)
+                except ValueError as e:
+                    print(repr(line.split("\t")))
+                    raise e
+
+                # Look through INFO for AC and AN, used for efficient calculations.
+                alt_counts, total_count, variant_type = parse_info(vcf_info_str)
+
+                yield BcftoolsRecord(
+                    int(vcf_position),
+                    vcf_reference,
+                    vcf_all_alts.split(","),
+                    alt_counts,
+                    total_count,
+                    variant_type,
+                    vcf_genotypes,
+                )
+        finally:
+            query_process.stdout.close()
+            query_process.kill()
+            query_process.wait()
+
+
+class HtslibReader:
+    """
+    Reads the VCF/BCF in-process through pysam (htslib bindings) and
+    yields typed records, avoiding the bcftools text round trip.
+    """
+
+    name = "htslib"
+
+    def __init__(self):
+        self.sample_names = []
+
+    # the file and its index are opened once for all regions
+    def fetch(self, vcf_location, regions, samples=[], include_samples=False):
+        # htslib saves remote indices to the working directory
+        os.chdir("/tmp")
+
+        with pysam.VariantFile(vcf_location) as vcf:
+            if samples:
+                vcf.subset_samples(samples)
+            self.sample_names = list(vcf.header.samples)
+            has_ac = "AC" in vcf.header.info
+            has_an = "AN" in vcf.header.info
+            has_vt = "VT" in vcf.header.info
+
+            for region in regions:
+                first_base_pos = int(region[region.find(":") + 1 : region.find("-")])
+
+                for record in vcf.fetch(region=region):
+                    # records overlapping from the previous region were seen
+                    if record.pos < first_base_pos:
+                        continue
+                    alt_counts = None
+                    total_count = None
+                    variant_type = "N/A"
+
+                    if has_ac and "AC" in record.info:
+                        alt_counts = list(record.info["AC"])
+                    if has_an and "AN" in record.info:
+                        total_count = record.info["AN"]
+                    if has_vt and "VT" in record.info:
+                        variant_type = record.info["VT"]
+                        if not isinstance(variant_type, str):
+                            variant_type = ",".join(variant_type)
+
+                    yield HtslibRecord(
+                        record.pos,
+                        record.ref,
+                        list(record.alts) if record.alts else ["."],
+                        alt_counts,
+                        total_count,
+                        variant_type,
+                        record.samples,
+                    )
+
+
+def get_reader(backend):
+    if backend == HtslibReader.name:
+        if pysam is not None:
+            return HtslibReader()
+        print("pysam is not available, falling back to bcftools")
+    return BcftoolsReader()
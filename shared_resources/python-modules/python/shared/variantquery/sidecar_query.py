@@ -0,0 +1,216 @@
+import os
+import time
+
+import boto3
+from botocore.exceptions import ClientError
+import numpy as np
+
+from shared.genotypes import ROW_DTYPE, SidecarHeader, sidecar_key
+from shared.payloads import VariantColumns
+
+
+VARIANTS_BUCKET = os.environ["VARIANTS_BUCKET"]
+# how long a missing sidecar is remembered before looking again
+MISSING_SIDECAR_TTL = 60
+# how long a cached sidecar is used before its vcf is checked again
+SIDECAR_CHECK_TTL = 60
+
+s3 = boto3.client("s3")
+
+# vcf_location -> (sidecar etag, header), kept while the vcf is unchanged
+sidecar_headers = {}
+# vcf_location -> time its cached sidecar was last checked against the vcf
+sidecar_checked = {}
+# vcf_location -> time of the last lookup that found no usable sidecar
+missing_sidecars = {}
+
+
+def split_s3_location(location):
+    bucket, key = location[5:].split("/", 1)
+    return bucket, key
+
+
+def read_sidecar_range(key, start, end, etag=None):
+    if start >= end:
+        return b"", etag
+    kwargs = {
+        "Bucket": VARIANTS_BUCKET,
+        "Key": key,
+        "Range": f"bytes={start}-{end - 1}",
+    }
+    if etag is not None:
+        kwargs["IfMatch"] = etag
+    response = s3.get_object(**kwargs)
+    return response["Body"].read(), response["ETag"]
+
+
+def load_sidecar(vcf_location):
+    key = sidecar_key(vcf_location)
+    etags = []
+
+    def read_range(start, end):
+        data, etag = read_sidecar_range(key, start, end)
+        etags.append(etag)
+        return data
+
+    try:
+        header = SidecarHeader.load(read_range)
+    except ClientError as error:
+        if error.response["Error"]["Code"] in ("NoSuchKey", "404", "403"):
+            return None
+        raise error
+
+    # a sidecar built from an older version of the vcf must not be used
+    if header.vcf_etag != get_vcf_etag(vcf_location) or len(set(etags)) != 1:
+        print(f"Ignoring stale genotype sidecar for {vcf_location}")
+        return None
+
+    return etags[0], header
+
+
+def get_vcf_etag(vcf_location):
+    bucket, vcf_key = split_s3_location(vcf_location)
+    return s3.head_object(Bucket=bucket, Key=vcf_key)["ETag"]
+
+
+def get_sidecar(vcf_location):
+    if vcf_location in sidecar_headers:
+        if time.time() - sidecar_checked[vcf_location] < SIDECAR_CHECK_TTL:
+            return sidecar_headers[vcf_location]
+        # a vcf replaced in place leaves its old sidecar behind
+        _, header = sidecar_headers[vcf_location]
+
+        if header.vcf_etag == get_vcf_etag(vcf_location):
+            sidecar_checked[vcf_location] = time.time()
+            return sidecar_headers[vcf_location]
+        print(f"Dropping cached genotype sidecar of changed {vcf_location}")
+        sidecar_headers.pop(vcf_location)
+    if time.time() - missing_sidecars.get(vcf_location, 0) < MISSING_SIDECAR_TTL:
+        return None
+
+    sidecar = load_sidecar(vcf_location)
+
+    if sidecar is None:
+        missing_sidecars[vcf_location] = time.time()
+    else:
+        sidecar_headers[vcf_location] = sidecar
+        sidecar_checked[vcf_location] = time.time()
+    return sidecar
+
+
+def read_sections(vcf_location, etag, header, first_row, last_row):
+    key = sidecar_key(vcf_location)
+    rows_data, _ = read_sidecar_range(
+        key, *header.rows_range(first_row, last_row), etag
+    )
+    rows = np.frombuffer(rows_data, dtype=ROW_DTYPE)
+    bits_data, _ = read_sidecar_range(
+        key, *header.bits_range(first_row, last_row), etag
+    )
+    bits = np.frombuffer(bits_data, dtype=np.uint8).reshape(
+        len(rows), header.row_bytes
+    )
+    text_start, text_end = header.text_range(rows)
+    text, _ = read_sidecar_range(key, text_start, text_end, etag)
+
+    return rows, bits, text, text_start - header.text_offset
+
+
+def query_sidecar(
+    vcf_location,
+    chromosome,
+    first_base_pos,
+    last_base_pos,
+    end_min,
+    end_max,
+    reference_bases,
+    matcher,
+    chosen_samples,
+):
+    """
+    Answers a record level sample query from the genotype sidecar.
+    Returns None when the vcf has no usable sidecar or the query is
+    limited to chosen samples, in which case the caller must fall back
+    to reading the vcf.
+    """
+    # rows hold ac and an of the whole cohort and the bits only mark
+    # carriers, counts over a subset of samples cannot be derived
+    if chosen_samples:
+        return None
+
+    sidecar = get_sidecar(vcf_location)
+
+    if sidecar is None:
+        return None
+
+    etag, header = sidecar
+    first_row, last_row = header.row_range(chromosome, first_base_pos, last_base_pos)
+
+    try:
+        rows, bits, text, text_base = read_sections(
+            vcf_location, etag, header, first_row, last_row
+        )
+    except ClientError as error:
+        # sidecar was replaced since the header was cached
+        if error.response["Error"]["Code"] != "PreconditionFailed":
+            raise error
+        sidecar_headers.pop(vcf_location, None)
+        return query_sidecar(
+            vcf_location,
+            chromosome,
+            first_base_pos,
+            last_base_pos,
+            end_min,
+            end_max,
+            reference_bases,
+            matcher,
+            chosen_samples,
+        )
+
+    variants = VariantColumns()
+    call_count = 0
+    all_alleles_count = 0
+    counted_records = set()
+    carriers = np.zeros(header.row_bytes, dtype=np.uint8)
+
+    for row, row_bits in zip(rows, bits):
+        vcf_position = int(row["pos"])
+
+        if not first_base_pos <= vcf_position <= last_base_pos:
+            continue
+
+        offset = int(row["text_offset"]) - text_base
+        vcf_reference, vcf_alt, vcf_variant_type = (
+            text[offset : offset + int(row["text_length"])].decode().split("\t")
+        )
+
+        if not end_min <= vcf_position + len(vcf_reference) - 1 <= end_max:
+            continue
+        if vcf_reference.upper() != reference_bases and reference_bases != "N":
+            continue
+        if not matcher(vcf_reference, [vcf_alt]):
+            continue
+
+        if row["ac"]:
+            variants.append(
+                chromosome, vcf_position, vcf_reference, vcf_alt, vcf_variant_type
+            )
+            call_count += int(row["ac"])
+            np.bitwise_or(carriers, row_bits, out=carriers)
+
+        # AN is per record, not per alternate allele
+        if int(row["record"]) not in counted_records:
+            counted_records.add(int(row["record"]))
+            all_alleles_count += int(row["an"])
+
+    carrier_indices = np.flatnonzero(
+        np.unpackbits(carriers, bitorder="little")[: len(header.samples)]
+    )
+
+    return {
+        "exists": call_count > 0,
+        "all_alleles_count": all_alleles_count,
+        "variants": variants,
+        "call_count": call_count,
+        "sample_names": [header.samples[i] for i in carrier_indices.tolist()],
+    }
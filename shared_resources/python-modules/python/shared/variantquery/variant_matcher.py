@@ -0,0 +1,135 @@
+from functools import lru_cache
+import re
+
+
+# reference dependent patterns are shared across records and payloads
+# of a warm container, the same reference alleles repeat very often
+@lru_cache(maxsize=1024)
+def duplication_pattern(reference):
+    return re.compile("({}){{2,}}".format(re.escape(reference)))
+
+
+@lru_cache(maxsize=1024)
+def copy_number_pattern(reference):
+    return re.compile("\\.|({})*".format(re.escape(reference)))
+
+
+def build_matcher(
+    variant_type=None, alternate_bases="N", min_length=0, max_length=float("inf")
+):
+    """
+    Compiles the allele specification of a query into a single callable.
+    The returned function takes the reference and the list of alternates
+    of a record and returns the indexes of the matching alternates.
+    """
+    prefix = f"<{variant_type}"
+
+    # alternate base not defined
+    if alternate_bases == "N" and variant_type is not None:
+        if variant_type == "DEL":
+
+            def matcher(reference, alts):
+                reference_length = len(reference)
+                return [
+                    i
+                    for i, alt in enumerate(alts)
+                    if min_length <= len(alt) <= max_length
+                    and (
+                        (alt.startswith(prefix) or alt == "<CN0>")
+                        if alt.startswith("<")
+                        else len(alt) < reference_length
+                    )
+                ]
+
+        elif variant_type == "INS":
+
+            def matcher(reference, alts):
+                reference_length = len(reference)
+                return [
+                    i
+                    for i, alt in enumerate(alts)
+                    if min_length <= len(alt) <= max_length
+                    and (
+                        alt.startswith(prefix)
+                        if alt.startswith("<")
+                        else len(alt) > reference_length
+                    )
+                ]
+
+        elif variant_type == "DUP":
+
+            def matcher(reference, alts):
+                pattern = duplication_pattern(reference)
+                return [
+                    i
+                    for i, alt in enumerate(alts)
+                    if min_length <= len(alt) <= max_length
+                    and (
+                        (
+                            alt.startswith(prefix)
+                            or (alt.startswith("<CN") and alt not in ("<CN0>", "<CN1>"))
+                        )
+                        if alt.startswith("<")
+                        else pattern.fullmatch(alt)
+                    )
+                ]
+
+        elif variant_type == "DUP:TANDEM":
+
+            def matcher(reference, alts):
+                tandem = reference + reference
+                return [
+                    i
+                    for i, alt in enumerate(alts)
+                    if min_length <= len(alt) <= max_length
+                    and (
+                        (alt.startswith(prefix) or alt == "<CN2>")
+                        if alt.startswith("<")
+                        else alt == tandem
+                    )
+                ]
+
+        elif variant_type == "CNV":
+
+            def matcher(reference, alts):
+                pattern = copy_number_pattern(reference)
+                return [
+                    i
+                    for i, alt in enumerate(alts)
+                    if min_length <= len(alt) <= max_length
+                    and (
+                        alt.startswith((prefix, "<CN", "<DEL", "<DUP"))
+                        if alt.startswith("<")
+                        else pattern.fullmatch(alt)
+                    )
+                ]
+
+        else:
+            # For structural variants that aren't otherwise recognisable
+            def matcher(reference, alts):
+                return [
+                    i
+                    for i, alt in enumerate(alts)
+                    if alt.startswith(prefix) and min_length <= len(alt) <= max_length
+                ]
+
+    # if alternate base defined
+    # here we should check for the asked variant lengths
+    elif alternate_bases == "N":
+
+        def matcher(reference, alts):
+            return [
+                i for i, alt in enumerate(alts) if min_length <= len(alt) <= max_length
+            ]
+
+    else:
+
+        def matcher(reference, alts):
+            return [
+                i
+                for i, alt in enumerate(alts)
+                if alt.upper() == alternate_bases
+                and min_length <= len(alt) <= max_length
+            ]
+
+    return matcher
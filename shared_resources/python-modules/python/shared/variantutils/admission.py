@@ -0,0 +1,71 @@
+import math
+import uuid
+
+from shared.dynamodb import LeasedBudget
+from shared.utils import ENV_CONFIG
+
+
+# share of the concurrency kept free of large searches, so small ones
+# that run direct or in process are never queued behind them
+SMALL_LANE_SHARE = 0.2
+# share of the large search budget a single user group may hold
+GROUP_SHARE = 0.5
+# a slot is one running performQuery invocation, handed back when its
+# results arrive, slots of searches that died are reclaimed once their
+# lease has not been renewed for this many seconds
+LEASE_SECONDS = 60.0
+
+
+class Admission:
+    """
+    Admits the performQuery invocations of a large variant search against
+    two budgets of slots, one shared by all large searches and one of the
+    user group. The search holds its slots under its own lease until it
+    releases them. Invocations that are not admitted wait in the caller.
+    """
+
+    def __init__(self, group):
+        self.lease = uuid.uuid4().hex
+        capacity = ENV_CONFIG.CONFIG_MAX_VARIANT_QUERY_CONCURRENCY
+        capacity *= 1 - SMALL_LANE_SHARE
+        self.shared = LeasedBudget("large", capacity, LEASE_SECONDS)
+        capacity *= GROUP_SHARE
+        self.group = LeasedBudget(f"group#{group}", capacity, LEASE_SECONDS)
+        # most invocations a single search can have running at once
+        self.capacity = max(1, math.floor(capacity))
+        self.available = True
+
+    def acquire(self, wanted):
+        # without the budgets table searches run unthrottled as before
+        if not self.available:
+            return wanted
+        try:
+            granted = self.group.acquire(self.lease, wanted)
+            if granted == 0:
+                return 0
+            try:
+                admitted = self.shared.acquire(self.lease, granted)
+            except Exception as e:
+                # nothing runs on the group slots taken above
+                self.group.release(self.lease, granted)
+                raise e
+            if admitted < granted:
+                self.group.release(self.lease, granted - admitted)
+            return admitted
+        except Exception as e:
+            print("Concurrency budgets unavailable, admitting everything\n", e)
+            self.available = False
+            return wanted
+
+    def release(self, count):
+        if not self.available or count <= 0:
+            return
+        try:
+            self.shared.release(self.lease, count)
+            self.group.release(self.lease, count)
+        except Exception as e:
+            print("Unable to release concurrency slots\n", e)
+
+
+if __name__ == "__main__":
+    pass
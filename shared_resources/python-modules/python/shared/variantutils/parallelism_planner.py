@@ -0,0 +1,114 @@
+from collections import deque
+import math
+import threading
+
+import numpy as np
+
+from shared.utils import ENV_CONFIG
+
+
+# threads of the api lambda invoking performQuery without splitQuery
+DIRECT_THREADS = 64
+# larger searches always go through splitQuery
+DIRECT_MAX_PAYLOADS = 64
+HISTORY_SIZE = 200
+# observations needed before fitted values replace the defaults
+MIN_OBSERVATIONS = 10
+# seconds = a * N / P + b * P + c for N payloads over P splitQuery calls,
+# c covers the splitQuery hop and reading the streamed results
+DEFAULT_SPLIT_COEFFICIENTS = (0.02, 0.01, 1.5)
+# seconds of one performQuery invocation
+DEFAULT_DIRECT_LATENCY = 1.0
+
+
+class ParallelismPlanner:
+    """
+    Picks how a variant search fans out, from the latency of recent
+    searches of this container. Split searches record (N, P, seconds)
+    and the cost coefficients are refitted by least squares, direct
+    searches record the latency of each performQuery invocation.
+    """
+
+    def __init__(self):
+        self.split_history = deque(maxlen=HISTORY_SIZE)
+        self.direct_history = deque(maxlen=HISTORY_SIZE)
+        self.lock = threading.Lock()
+        self.coefficients = DEFAULT_SPLIT_COEFFICIENTS
+
+    def record_split(self, n_payloads, n_chunks, seconds, payload_bytes):
+        print(
+            f"Split search of {n_payloads} payloads ({payload_bytes} bytes) "
+            f"over {n_chunks} chunks took {seconds:.2f}s"
+        )
+        with self.lock:
+            self.split_history.append((n_payloads, n_chunks, seconds))
+            self.coefficients = self.fit()
+
+    def record_direct(self, seconds):
+        with self.lock:
+            self.direct_history.append(seconds)
+
+    def fit(self):
+        if len(self.split_history) < MIN_OBSERVATIONS:
+            return DEFAULT_SPLIT_COEFFICIENTS
+
+        history = np.array(self.split_history, dtype=float)
+        n, p, seconds = history[:, 0], history[:, 1], history[:, 2]
+        design = np.column_stack([n / p, p, np.ones_like(n)])
+        solution, *_ = np.linalg.lstsq(design, seconds, rcond=None)
+        a, b, c = solution
+
+        # searches of one shape do not pin down every coefficient,
+        # keep the defaults for the ones that come out meaningless
+        return (
+            a if a > 0 else DEFAULT_SPLIT_COEFFICIENTS[0],
+            b if b > 0 else DEFAULT_SPLIT_COEFFICIENTS[1],
+            max(c, 0),
+        )
+
+    def direct_latency(self):
+        if len(self.direct_history) < MIN_OBSERVATIONS:
+            return DEFAULT_DIRECT_LATENCY
+        return float(np.percentile(self.direct_history, 90))
+
+    def split_cost(self, n_payloads, n_chunks):
+        a, b, c = self.coefficients
+        return a * n_payloads / n_chunks + b * n_chunks + c
+
+    def direct_cost(self, n_payloads):
+        return self.direct_latency() * math.ceil(n_payloads / DIRECT_THREADS)
+
+    def best_chunks(self, n_payloads):
+        a, b, _ = self.coefficients
+        # the minimum of a * N / P + b * P, bounded by the concurrency limit
+        limit = min(ENV_CONFIG.CONFIG_MAX_VARIANT_QUERY_CONCURRENCY, n_payloads)
+        limit = max(limit, 1)
+        best = min(max(round(math.sqrt(a * n_payloads / b)), 1), limit)
+
+        return min(
+            {max(best - 1, 1), best, min(best + 1, limit)},
+            key=lambda chunks: self.split_cost(n_payloads, chunks),
+        )
+
+    def plan(self, n_payloads, allow_direct=True):
+        """
+        Returns ("direct", None) when invoking performQuery from the api
+        lambda is expected to be faster, else ("split", chunk size).
+        """
+        if n_payloads == 0:
+            return "direct", None
+
+        n_chunks = self.best_chunks(n_payloads)
+
+        if allow_direct and n_payloads <= DIRECT_MAX_PAYLOADS and self.direct_cost(
+            n_payloads
+        ) <= self.split_cost(n_payloads, n_chunks):
+            return "direct", None
+        return "split", math.ceil(n_payloads / n_chunks)
+
+
+planner = ParallelismPlanner()
+
+
+if __name__ == "__main__":
+    pass
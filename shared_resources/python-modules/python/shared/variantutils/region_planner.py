@@ -0,0 +1,176 @@
+import io
+import time
+
+import boto3
+from botocore.exceptions import ClientError
+
+from shared.vcfindex import VcfIndex
+
+
+# compressed bytes of vcf data assigned to one performQuery invocation
+SPLIT_BYTES = 1024 * 1024
+# how long a loaded index is trusted before its ETag is checked again
+INDEX_TTL = 300
+INDEX_EXTENSIONS = (".tbi", ".csi")
+
+
+s3 = boto3.client("s3")
+# vcf location -> (index location, index etag, last checked, VcfIndex)
+# or None when the vcf has no readable index
+indices = {}
+
+
+def split_s3_location(location):
+    bucket, key = location[5:].split("/", 1)
+    return bucket, key
+
+
+def fetch_index(vcf_location):
+    for extension in INDEX_EXTENSIONS:
+        bucket, key = split_s3_location(vcf_location + extension)
+        try:
+            response = s3.get_object(Bucket=bucket, Key=key)
+        except ClientError as error:
+            if error.response["Error"]["Code"] in ("NoSuchKey", "404", "403"):
+                continue
+            raise error
+        index = VcfIndex.load(
+            io.BytesIO(response["Body"].read()), vcf_location + extension
+        )
+        return vcf_location + extension, response["ETag"], time.time(), index
+    return None
+
+
+def get_index(vcf_location):
+    cached = indices.get(vcf_location)
+
+    if cached is not None and time.time() - cached[2] > INDEX_TTL:
+        index_location, etag, _, index = cached
+        bucket, key = split_s3_location(index_location)
+        try:
+            current = s3.head_object(Bucket=bucket, Key=key)["ETag"]
+        except ClientError:
+            current = None
+        if current == etag:
+            indices[vcf_location] = index_location, etag, time.time(), index
+        else:
+            del indices[vcf_location]
+
+    if vcf_location not in indices:
+        indices[vcf_location] = fetch_index(vcf_location)
+
+    cached = indices[vcf_location]
+    return cached[3] if cached else None
+
+
+def window_weights(index, contig, first_window, last_window):
+    """
+    Estimated compressed bytes of the records starting in each index
+    window (2^min_shift bases) between first_window and last_window.
+    Windows without any bin on their path to the root hold no records.
+    """
+    weights = [0] * (last_window - first_window + 1)
+    tid = index.names.index(contig)
+    first_leaf = ((1 << (index.depth * 3)) - 1) // 7
+
+    for bin_number, entry in index.ref_bins(tid).items():
+        if bin_number > index.bin_limit:
+            continue
+
+        # windows covered by this bin, from its level in the tree
+        level_first, level = 0, 0
+        while bin_number >= level_first + (1 << (level * 3)):
+            level_first += 1 << (level * 3)
+            level += 1
+        span = 1 << ((index.depth - level) * 3)
+        bin_first = (bin_number - level_first) * span
+        lo = max(bin_first, first_window)
+        hi = min(bin_first + span - 1, last_window)
+
+        if lo > hi:
+            continue
+
+        size = sum(
+            max(
+                (chunk["chunk_end"]["virtual_file_offset"] >> 16)
+                - (chunk["chunk_beg"]["virtual_file_offset"] >> 16),
+                1,
+            )
+            for chunk in entry["chunks"]
+        )
+        # bytes of bins above the leaves are shared by the windows they cover
+        share = size / span if bin_number < first_leaf else size
+
+        for window in range(lo, hi + 1):
+            weights[window - first_window] += max(share, 1)
+
+    return weights
+
+
+def estimate_bytes(vcf_location, contig, start, end):
+    """
+    Estimated compressed bytes of the records of a contig starting in
+    [start, end], or None when the index cannot tell.
+    """
+    try:
+        index = get_index(vcf_location)
+    except Exception as e:
+        print(f"Unable to load index of {vcf_location}\n", e)
+        return None
+
+    if index is None or contig not in index.names:
+        return None
+
+    shift = index.min_shift
+    return sum(
+        window_weights(index, contig, (start - 1) >> shift, (end - 1) >> shift)
+    )
+
+
+def plan_regions(vcf_location, contig, start, end, split_bytes=SPLIT_BYTES):
+    """
+    Splits the 1-based range [start, end] of a contig into regions holding
+    roughly split_bytes of compressed data each, leaving out stretches
+    without data. Returns None when the index cannot be used, so the
+    caller can fall back to fixed size windows.
+    """
+    try:
+        index = get_index(vcf_location)
+    except Exception as e:
+        print(f"Unable to load index of {vcf_location}\n", e)
+        return None
+
+    if index is None or contig not in index.names:
+        return None
+
+    shift = index.min_shift
+    first_window = (start - 1) >> shift
+    last_window = (end - 1) >> shift
+    weights = window_weights(index, contig, first_window, last_window)
+    regions = []
+    region_start = None
+    region_bytes = 0
+
+    for offset, weight in enumerate(weights):
+        if weight == 0:
+            continue
+
+        window = first_window + offset
+        if region_start is None:
+            region_start = max((window << shift) + 1, start)
+        region_end = min((window + 1) << shift, end)
+        region_bytes += weight
+
+        if region_bytes >= split_bytes:
+            regions.append((region_start, region_end))
+            region_start = None
+            region_bytes = 0
+
+    if region_start is not None:
+        regions.append((region_start, region_end))
+
+    return regions
+
+
+if __name__ == "__main__":
+    pass
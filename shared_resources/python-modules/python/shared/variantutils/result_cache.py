@@ -0,0 +1,74 @@
+from datetime import timedelta
+import hashlib
+import json
+import os
+
+from shared.dynamodb import (
+    Dataset as DynamoDataset,
+    JobStatus,
+    get_job_status,
+    get_query_results,
+    save_query_results,
+)
+
+
+VARIANTS_BUCKET = os.environ.get("VARIANTS_BUCKET")
+# results are kept well within the one day expiry of variant-queries/ in s3
+CACHE_TTL = timedelta(hours=12)
+
+
+def dataset_versions(dataset_ids):
+    # a dataset submitted again gets a new updateDateTime, so cached
+    # results of its older contents are never looked up again
+    versions = {dataset_id: "" for dataset_id in dataset_ids}
+
+    for item in DynamoDataset.batch_get(
+        list(versions), attributes_to_get=["id", "updateDateTime"]
+    ):
+        versions[item.id] = item.updateDateTime.isoformat()
+    return versions
+
+
+def cache_key(datasets, dataset_samples, search):
+    """
+    Key of a variant search, from its normalised parameters and the
+    contents and versions of the datasets it runs on.
+    """
+    versions = dataset_versions([dataset.id for dataset in datasets])
+    key = {
+        **search,
+        "datasets": sorted(
+            [
+                dataset.id,
+                versions[dataset.id],
+                sorted(dataset._vcfLocations),
+                sorted(dataset_samples[n]) if dataset_samples else [],
+            ]
+            for n, dataset in enumerate(datasets)
+        ),
+    }
+    key_str = json.dumps(key, sort_keys=True, default=str)
+
+    return "cache-" + hashlib.md5(key_str.encode()).hexdigest()
+
+
+def get_cached(key):
+    try:
+        if get_job_status(key) == JobStatus.COMPLETED:
+            return get_query_results(key)
+    except Exception as e:
+        print("Unable to read cached results\n", e)
+    return None
+
+
+def put_cached(key, results):
+    if VARIANTS_BUCKET is None:
+        return
+    try:
+        save_query_results(key, results, VARIANTS_BUCKET, CACHE_TTL)
+    except Exception as e:
+        print("Unable to cache results\n", e)
+
+
+if __name__ == "__main__":
+    pass
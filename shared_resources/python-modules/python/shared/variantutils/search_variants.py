@@ -1,76 +1,201 @@
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import deque
 import os
 import json
 from typing import List
 import math
 import gzip
 import base64
+import uuid
+import time
 
 import boto3
 import jsons
 
-from shared.utils import get_matching_chromosome
-from shared.payloads import PerformQueryResponse
-from shared.utils import LambdaClient
+from shared.utils import get_matching_chromosome, ENV_CONFIG
+from shared.payloads import (
+    PerformQueryResponse,
+    pack_payloads,
+    put_sample_list,
+    INLINE_SAMPLES_LIMIT,
+)
+from shared.utils import LambdaFanOut
+from shared.dynamodb import cancel_query, iter_response_pages
+from .region_planner import plan_regions, estimate_bytes
+from .result_cache import cache_key, get_cached, put_cached
+from .parallelism_planner import planner, DIRECT_THREADS
+from .admission import Admission
 
 
 SPLIT_QUERY_LAMBDA = os.environ["SPLIT_QUERY_LAMBDA"]
+PERFORM_QUERY_LAMBDA = os.environ.get("PERFORM_QUERY_LAMBDA")
+VARIANTS_BUCKET = os.environ.get("VARIANTS_BUCKET")
 SPLIT_SIZE = 20000
+# windows of the same vcf answered by one performQuery invocation
+REGIONS_PER_QUERY = 8
+# splitQuery invocations in flight per search
 THREADS = 200
+# searches of at most this many payloads may run inside the api lambda,
+# when their estimated size is below CONFIG_VARIANT_QUERY_LOCAL_THRESHOLD
+LOCAL_MAX_PAYLOADS = 8
+LOCAL_THREADS = 4
+ASYNC_PAYLOAD_LIMIT = 250 * 1024
+# seconds to wait for all streamed results, within the api gateway limit
+STREAM_TIMEOUT = 28
 
 
 s3 = boto3.client("s3")
-aws_lambda = LambdaClient()
+local_executor = None
 
 
-def fan_out(payload: List[dict]):
-    # stringified payload
-    payload_str = json.dumps(payload)
+def stream_invocation(payload: List[dict], offset: int):
+    # shared fields and sample lists are sent once, splitQuery expands them
+    payload_str = json.dumps(
+        {"stream": True, "offset": offset, **pack_payloads(payload)},
+        separators=(",", ":"),
+    )
 
-    # compress if larger than 100 kb
     if len(payload_str) > 100 * 1024:
         payload_str = json.dumps(
             base64.b64encode(gzip.compress(payload_str.encode())).decode()
         )
 
-    response = aws_lambda.invoke(
-        FunctionName=SPLIT_QUERY_LAMBDA,
-        InvocationType="RequestResponse",
-        Payload=payload_str,
-    )
-    parsed = None
+    # results arrive through the responses table either way, asynchronous
+    # invocations are limited to 256 kb so larger chunks wait for the call
+    if len(payload_str) < ASYNC_PAYLOAD_LIMIT:
+        invocation_type = "Event"
+    else:
+        invocation_type = "RequestResponse"
+
+    return {
+        "FunctionName": SPLIT_QUERY_LAMBDA,
+        "InvocationType": invocation_type,
+        "Payload": payload_str,
+    }
+
+
+def offload_samples(payloads: List[dict]):
+    # long sample lists leaving this lambda are written to s3 once per
+    # dataset and sent by reference, payloads of a dataset share the list
+    references = {}
+
+    for payload in payloads:
+        samples = payload["samples"]
+
+        if len(samples) > INLINE_SAMPLES_LIMIT and VARIANTS_BUCKET:
+            if id(samples) not in references:
+                references[id(samples)] = {
+                    "location": put_sample_list(samples, VARIANTS_BUCKET)
+                }
+            payload["samples"] = references[id(samples)]
+    return payloads
+
+
+def get_local_executor():
+    global local_executor
+
+    if local_executor is None:
+        local_executor = ThreadPoolExecutor(LOCAL_THREADS)
+    return local_executor
+
+
+# the smallest searches run the performQuery engine in this lambda
+def local_search(payloads: List[dict]):
+    # the engine pulls in the vcf readers, only needed on this path
+    from shared.variantquery import perform_query
+
+    executor = get_local_executor()
+    futures = [executor.submit(perform_query, payload) for payload in payloads]
+
     try:
-        parsed = json.loads(response["Payload"].read())
-        parsed = jsons.default_list_deserializer(parsed, List[PerformQueryResponse])
-    except Exception as e:
-        print(parsed, e)
-        raise e
-    return parsed
+        for future in as_completed(futures):
+            result = future.result()
+            yield result if isinstance(result, list) else [result]
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+# small searches skip the splitQuery hop and the responses table
+def direct_search(payloads: List[dict]):
+    with LambdaFanOut(DIRECT_THREADS) as fan_out:
+        for n, payload in enumerate(payloads):
+            fan_out.submit(
+                n,
+                FunctionName=PERFORM_QUERY_LAMBDA,
+                InvocationType="RequestResponse",
+                Payload=json.dumps(payload),
+            )
 
+        for n, result in fan_out.as_completed():
+            planner.record_direct(fan_out.elapsed[n])
 
-def f_cost(N, P):
-    return 0.05 * N / P + 0.05 * P
+            if isinstance(result, dict) and "errorMessage" in result:
+                raise Exception(result["errorMessage"])
+            yield result if isinstance(result, list) else [result]
 
 
-def df_cost(N, P):
-    return -0.05 * N / (P**2) + 0.05
+def split_search(payloads: List[dict], query_id: str, chunk_size: int, group: str):
+    start = time.time()
+    admission = Admission(group)
+    # chunks not yet admitted, by the offset of their first payload
+    waiting = deque(
+        (itr, payloads[itr : itr + chunk_size])
+        for itr in range(0, len(payloads), chunk_size)
+    )
+    # slots taken for admitted payloads, and how many of those were answered
+    held = 0
+    answered = 0
+    # every chunk in flight holds at least one slot of the group
+    threads = max(1, min(THREADS, len(waiting), admission.capacity))
+
+    with LambdaFanOut(threads) as fan_out:
 
+        def admit():
+            nonlocal held, answered
+            fan_out.raise_errors()
+            # slots of answered payloads go back before more are taken
+            admission.release(answered)
+            held -= answered
+            answered = 0
 
-# adding scipy will be a huge overhead on lambda layers
-# this finds P such that cost is nil
-# compared to newton method, this seems a faster alternative
-def best_parallelism(N):
-    chosen = 1
-    best_cost = float("inf")
-    # This range must be smaller than total available concurrency
-    # otherwise the pipeline will hang without enough lambdas to continue
-    # TODO make 800 an env variable
-    for P in range(1, 800):
-        if (cost := f_cost(N, P)) < best_cost:
-            best_cost = cost
-            chosen = P
+            while waiting:
+                offset, chunk = waiting.popleft()
+                granted = admission.acquire(len(chunk))
 
-    return chosen
+                if granted == 0:
+                    waiting.appendleft((offset, chunk))
+                    break
+                held += granted
+                # the rest of a partly admitted chunk keeps its offsets
+                if granted < len(chunk):
+                    waiting.appendleft((offset + granted, chunk[granted:]))
+                fan_out.submit(offset, **stream_invocation(chunk[:granted], offset))
+
+        try:
+            admit()
+
+            # results of each payload are read as soon as splitQuery writes
+            # them, waiting chunks are admitted between polls as slots return
+            for _, page in iter_response_pages(
+                query_id, len(payloads), STREAM_TIMEOUT, admit
+            ):
+                answered += 1
+
+                if isinstance(page, dict):
+                    raise Exception(page["error"])
+                yield page
+        finally:
+            # workers still running were cancelled or outlived the api call
+            admission.release(held)
+
+    # searches stopped early by a boolean hit say little about the cost
+    planner.record_split(
+        len(payloads),
+        len(fan_out.futures),
+        time.time() - start,
+        sum(len(json.dumps(payload)) for payload in payloads),
+    )
 
 
 def perform_variant_search(
@@ -86,9 +211,10 @@ def perform_variant_search(
     variant_max_length=-1,
     requested_granularity="boolean",
     include_datasets="ALL",
-    query_id="TEST",
+    query_id=None,
     dataset_samples=[],
     include_samples=False,
+    user_group=None,
 ):
     try:
         # get vcf file and the name of chromosome in it eg: "chr1", "Chr4", "CHR1" or just "1"
@@ -115,11 +241,48 @@ def perform_variant_search(
         print("Error occured ", e)
         return False, []
 
+    # workers of this query share its id to learn about cancellation
+    query_id = query_id or uuid.uuid4().hex
     start_min += 1
     start_max += 1
     end_min += 1
     end_max += 1
+
+    # identical searches over unchanged datasets are answered from the cache
+    try:
+        key = cache_key(
+            datasets,
+            dataset_samples,
+            {
+                "reference_name": reference_name,
+                "reference_bases": (reference_bases or "N").upper(),
+                "alternate_bases": (alternate_bases or "N").upper(),
+                "start": [start_min, start_max],
+                "end": [end_min, end_max],
+                "variant_type": variant_type,
+                "variant_min_length": variant_min_length,
+                "variant_max_length": variant_max_length,
+                "requested_granularity": requested_granularity,
+                "include_datasets": include_datasets,
+                "include_samples": include_samples,
+            },
+        )
+    except Exception as e:
+        print("Unable to build the cache key\n", e)
+        key = None
+
+    cached = get_cached(key) if key else None
+
+    if cached is not None:
+        print(f"Returning cached results of {key}")
+        yield from jsons.default_list_deserializer(cached, List[PerformQueryResponse])
+        return
+
     payloads = []
+    # estimated compressed bytes to read, decides whether the search
+    # is small enough to run inside this lambda
+    local_threshold = ENV_CONFIG.CONFIG_VARIANT_QUERY_LOCAL_THRESHOLD * 1024
+    local_bytes = 0
 
     # parallelism across datasets
     for n, dataset in enumerate(datasets):
@@ -129,17 +292,45 @@ def perform_variant_search(
             if vcf_chromosomes[vcf]
         }
 
+        windows = []
         split_start = start_min
 
         while split_start <= start_max:
-            # TODO improve SPLIT_SIZE - make dynamic
             split_end = min(split_start + SPLIT_SIZE - 1, start_max)
-            for vcf_location, chrom in vcf_locations.items():
+            windows.append((split_start, split_end))
+            # next split
+            split_start += SPLIT_SIZE
+
+        samples = dataset_samples[n] if dataset_samples else []
+
+        for vcf_location, chrom in vcf_locations.items():
+            # regions of roughly equal compressed size from the vcf index,
+            # stretches without records are not queried at all
+            planned = plan_regions(vcf_location, chrom, start_min, start_max)
+
+            if planned is None:
+                # no usable index, consecutive fixed size windows are
+                # batched into one payload
+                batches = [
+                    windows[itr : itr + REGIONS_PER_QUERY]
+                    for itr in range(0, len(windows), REGIONS_PER_QUERY)
+                ]
+            else:
+                batches = [[region] for region in planned]
+
+            if 0 < local_threshold and local_bytes <= local_threshold:
+                estimate = estimate_bytes(vcf_location, chrom, start_min, start_max)
+                # without an index only point lookups are known to be small
+                if estimate is None:
+                    estimate = 0 if start_max - start_min < SPLIT_SIZE else math.inf
+                local_bytes += estimate
+
+            for batch in batches:
                 payload = {
                     "query_id": query_id,
                     "dataset_id": dataset.id,
                     "vcf_location": vcf_location,
-                    "samples": dataset_samples[n] if dataset_samples else [],
+                    "samples": samples,
                     "reference_bases": reference_bases or "N",
                     "alternate_bases": alternate_bases or "N",
                     "end_min": end_min,
@@ -148,30 +339,60 @@ def perform_variant_search(
                     "variant_max_length": variant_max_length,
                     "include_details": include_datasets in ("HIT", "ALL"),
                     "include_samples": include_samples,
-                    "region": f"{chrom}:{split_start}-{split_end}",
+                    "regions": [
+                        f"{chrom}:{split_start}-{split_end}"
+                        for split_start, split_end in batch
+                    ],
                     "variant_type": variant_type,
                     "requested_granularity": requested_granularity,
                 }
                 payloads.append(payload)
-            # next split
-            split_start += SPLIT_SIZE
 
     print("Start: event publishing")
-    # TODO further split by sample counts to avoid payload overflow
-    chunk_size = best_parallelism(len(payloads))
-    print(
-        f"PAYLOADS - {len(payloads)} CHUNK SIZE - {chunk_size} NO CHUNKS - {math.ceil(len(payloads)/chunk_size)}"
+    strategy, chunk_size = planner.plan(
+        len(payloads), allow_direct=PERFORM_QUERY_LAMBDA is not None
     )
-    executor = ThreadPoolExecutor(THREADS)
-    futures = [
-        executor.submit(fan_out, payloads[itr : itr + chunk_size])
-        for itr in range(0, len(payloads), chunk_size)
-    ]
 
-    for future in as_completed(futures):
-        yield from future.result()
+    if (
+        local_threshold > 0
+        and len(payloads) <= LOCAL_MAX_PAYLOADS
+        and local_bytes <= local_threshold
+    ):
+        print(f"PAYLOADS - {len(payloads)} LOCAL - {local_bytes} BYTES")
+        pages = local_search(payloads)
+    elif strategy == "direct":
+        print(f"PAYLOADS - {len(payloads)} DIRECT")
+        pages = direct_search(offload_samples(payloads))
+    else:
+        print(
+            f"PAYLOADS - {len(payloads)} CHUNK SIZE - {chunk_size} NO CHUNKS - {math.ceil(len(payloads)/chunk_size)}"
+        )
+        # large searches share the concurrency budget fairly across groups,
+        # callers without a group are grouped by the granularity they asked for
+        group = user_group or requested_granularity
+        pages = split_search(offload_samples(payloads), query_id, chunk_size, group)
+
+    collected = []
+
+    for page in pages:
+        results = jsons.default_list_deserializer(page, List[PerformQueryResponse])
+
+        # one hit answers a boolean query, stop the remaining workers
+        if requested_granularity == "boolean" and any(
+            result.exists for result in results
+        ):
+            cancel_query(query_id)
+            # callers stop reading at the hit, so it is cached first
+            if key:
+                put_cached(key, page)
+            yield from results
+            break
+        collected += page
+        yield from results
+    else:
+        if key:
+            put_cached(key, collected)
 
-    # No need to executor.shutdown() the executor at this point, it'd be an unwatned code line
     print("End: retrieved results")
 
 
@@ -0,0 +1,2 @@
+from .index_reader import Csi, Tbi
+from .vcf_index import VcfIndex, reg2bins, merge_ranges, MAX_BLOCK_SIZE
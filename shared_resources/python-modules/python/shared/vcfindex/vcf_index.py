@@ -0,0 +1,129 @@
+from .index_reader import Csi, Tbi
+
+
+# tabix indices have a fixed binning scheme
+TBI_MIN_SHIFT = 14
+TBI_DEPTH = 5
+# largest possible compressed BGZF block
+MAX_BLOCK_SIZE = 1 << 16
+
+
+def reg2bins(beg, end, min_shift, depth):
+    # bins overlapping the 0-based half open interval [beg, end)
+    bins = []
+    end -= 1
+    shift = min_shift + depth * 3
+    first = 0
+
+    for level in range(depth + 1):
+        bins.extend(range(first + (beg >> shift), first + (end >> shift) + 1))
+        shift -= 3
+        first += 1 << (level * 3)
+    return bins
+
+
+class VcfIndex:
+    """
+    Answers which compressed byte ranges of a bgzipped vcf hold the records
+    of a region, following the same steps as htslib's index iterator.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.names = index.names
+        self.is_csi = isinstance(index, Csi)
+        self.min_shift = index.min_shift if self.is_csi else TBI_MIN_SHIFT
+        self.depth = index.depth if self.is_csi else TBI_DEPTH
+        self.bin_limit = int(index.bin_limit)
+        # per reference {bin: bin entry}, built on first use
+        self.bins = {}
+
+    @classmethod
+    def load(cls, file_obj, index_location):
+        if index_location.endswith(".csi"):
+            return cls(Csi(file_obj))
+        return cls(Tbi(file_obj))
+
+    def ref_bins(self, tid):
+        if tid not in self.bins:
+            self.bins[tid] = {
+                entry["bin"]: entry for entry in self.index.refs[tid]["bins"]
+            }
+        return self.bins[tid]
+
+    def min_offset(self, tid, beg):
+        ref = self.index.refs[tid]
+
+        if not self.is_csi:
+            intvs = ref["intvs"]
+            if not intvs:
+                return 0
+            return intvs[min(beg >> TBI_MIN_SHIFT, len(intvs) - 1)]["ioff"][
+                "virtual_file_offset"
+            ]
+
+        # csi keeps the linear offset inside the bins, walk up from the leaf
+        bins = self.ref_bins(tid)
+        bin_number = (((1 << (self.depth * 3)) - 1) // 7) + (beg >> self.min_shift)
+
+        while bin_number > 0 and bin_number not in bins:
+            bin_number = (bin_number - 1) >> 3
+        return bins[bin_number]["loffset"] if bin_number in bins else 0
+
+    # (begin, end) virtual offsets of the chunks holding [beg, end), or
+    # None when the contig is not named in the index
+    def chunks(self, contig, beg, end):
+        if contig not in self.names:
+            return None
+
+        tid = self.names.index(contig)
+        bins = self.ref_bins(tid)
+        min_offset = self.min_offset(tid, beg)
+
+        return sorted(
+            (
+                chunk["chunk_beg"]["virtual_file_offset"],
+                chunk["chunk_end"]["virtual_file_offset"],
+            )
+            for bin_number in reg2bins(beg, end, self.min_shift, self.depth)
+            if bin_number in bins
+            for chunk in bins[bin_number]["chunks"]
+            if chunk["chunk_end"]["virtual_file_offset"] > min_offset
+        )
+
+    # compressed [start, end) byte ranges to read for [beg, end)
+    def byte_ranges(self, contig, beg, end):
+        chunks = self.chunks(contig, beg, end)
+
+        if chunks is None:
+            return None
+        return merge_ranges(
+            [
+                (chunk_beg >> 16, (chunk_end >> 16) + MAX_BLOCK_SIZE)
+                for chunk_beg, chunk_end in chunks
+            ]
+        )
+
+    # virtual offset of the first record, the header lies before it
+    def first_record_offset(self):
+        return min(
+            (
+                chunk["chunk_beg"]["virtual_file_offset"]
+                for ref in self.index.refs
+                for entry in ref["bins"]
+                if entry["bin"] <= self.bin_limit
+                for chunk in entry["chunks"]
+            ),
+            default=0,
+        )
+
+
+def merge_ranges(ranges):
+    merged = []
+
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
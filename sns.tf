@@ -18,6 +18,16 @@ resource "aws_sns_topic_subscription" "summariseVcf" {
   endpoint  = module.lambda-summariseVcf.lambda_function_arn
 }
 
+resource "aws_sns_topic" "indexGenotypes" {
+  name = "indexGenotypes"
+}
+
+resource "aws_sns_topic_subscription" "indexGenotypes" {
+  topic_arn = aws_sns_topic.indexGenotypes.arn
+  protocol  = "lambda"
+  endpoint  = module.lambda-indexGenotypes.lambda_function_arn
+}
+
 resource "aws_sns_topic" "summariseSlice" {
   name = "summariseSlice"
 }
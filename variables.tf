@@ -214,3 +214,33 @@ variable "config-max-variant-search-base-range" {
   description = "Max allowed range for variant searching"
   default     = 5000
 }
+
+variable "config-variant-query-reader" {
+  type        = string
+  description = "VCF reader used by performQuery, htslib (in-process) or bcftools (subprocess)"
+  default     = "htslib"
+}
+
+variable "config-variant-query-cache-size" {
+  type        = number
+  description = "Size in MB of the variant query block and index cache kept in /tmp, at most half of the ephemeral storage, 0 disables it"
+  default     = 512
+}
+
+variable "config-variant-query-local-threshold" {
+  type        = number
+  description = "Variant searches estimated to read at most this many KB of compressed vcf data run inside the api lambda, 0 disables it"
+  default     = 1024
+}
+
+variable "config-athena-columnar-results" {
+  type        = bool
+  description = "Read athena results of metadata queries as ORC written by UNLOAD instead of CSV"
+  default     = false
+}
+
+variable "config-max-variant-query-concurrency" {
+  type        = number
+  description = "Most splitQuery invocations a single variant search may fan out to, keep below the account concurrency limit"
+  default     = 800
+}